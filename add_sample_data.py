@@ -4,7 +4,7 @@ Add sample data to the Finance Assistant database.
 import json
 from datetime import datetime, timedelta
 from utils.database import (
-    add_expense, save_budget, add_goal, save_insights,
+    bulk_insert_expenses, save_budget, add_goal, save_insights,
     get_all_expenses, get_all_budgets, get_all_goals, get_insights
 )
 
@@ -60,6 +60,7 @@ def add_sample_expenses():
     }
     
     # Add expenses for the past 60 days with some variability
+    sample_expenses = []
     expenses_added = 0
     for days_ago in range(60, -1, -1):
         expense_date = today - timedelta(days=days_ago)
@@ -87,9 +88,12 @@ def add_sample_expenses():
                 "category": category
             }
             
-            add_expense(expense_data)
+            sample_expenses.append(expense_data)
             expenses_added += 1
     
+    # Insert all sample expenses in a single transaction
+    bulk_insert_expenses(sample_expenses)
+    
     print(f"Added {expenses_added} sample expenses")
 
 def add_sample_budgets():
@@ -0,0 +1,182 @@
+"""
+Load test the AI code paths against the local stub server.
+
+Runs categorize_expense, categorize_expenses_batch, analyze_spending_patterns
+and get_budget_recommendations concurrently and reports throughput, latency
+percentiles and how many calls were answered by the AI or by the fallbacks.
+Uses a temporary database so the real one is never touched.
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+
+import numpy as np
+
+from ai_stub_server import StubServer
+
+SCENARIOS = ["categorize", "categorize_batch", "spending_insights", "budget_recommendations"]
+LOAD_TEST_USER_ID = "load_test_user"
+
+def sample_expenses(count):
+    """Expenses shaped like get_all_expenses() results, spread over the last year."""
+    merchants = [
+        ("Grocery store", "Food", 85.40), ("Coffee shop", "Food", 4.75), ("Gas station", "Transportation", 42.10),
+        ("Streaming service", "Entertainment", 15.49), ("Rent payment", "Housing", 1500.00), ("Pharmacy", "Health", 23.99)
+    ]
+    today = date.today()
+    expenses = []
+    for index in range(count):
+        description, category, amount = merchants[index % len(merchants)]
+        amount_cents = int(round(amount * 100)) + index % 7 * 13
+        expenses.append({
+            "id": index + 1,
+            "description": description,
+            "amount": amount_cents / 100,
+            "amount_cents": amount_cents,
+            "date": str(today - timedelta(days=index * 365 // max(count, 1))),
+            "category": category
+        })
+    return expenses
+
+def _letters(number):
+    """Spell a number in letters; cache keys ignore digits, so numbered descriptions would collide."""
+    text = ""
+    while True:
+        number, digit = divmod(number, 26)
+        text = chr(ord("a") + digit) + text
+        if not number:
+            return text
+
+def _make_request(scenario, openai_utils, expenses, batch_size):
+    """Build the function that sends request number i for a scenario."""
+    # Unique descriptions so every categorization misses the cache and local model
+    run_id = _letters(time.time_ns())
+    if scenario == "categorize":
+        return lambda i: openai_utils.categorize_expense(f"load test merchant {run_id} {_letters(i)}", 12.5, LOAD_TEST_USER_ID)
+    if scenario == "categorize_batch":
+        return lambda i: openai_utils.categorize_expenses_batch(
+            [{"description": f"load test merchant {run_id} {_letters(i)} {_letters(n)}", "amount": 12.5} for n in range(batch_size)],
+            batch_size=batch_size,
+            user_id=LOAD_TEST_USER_ID
+        )
+    if scenario == "spending_insights":
+        return lambda i: openai_utils.analyze_spending_patterns(expenses, LOAD_TEST_USER_ID, force=True)
+    return lambda i: openai_utils.get_budget_recommendations(expenses)
+
+def run_scenario(scenario, openai_utils, requests, concurrency, expenses, batch_size):
+    """Send requests concurrently and summarize latency, throughput and fallbacks."""
+    request = _make_request(scenario, openai_utils, expenses, batch_size)
+    
+    def timed(i):
+        started = time.perf_counter()
+        request(i)
+        return time.perf_counter() - started
+    
+    before = openai_utils.get_llm_stats()["endpoints"].get(scenario, {})
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = np.array(list(pool.map(timed, range(requests))))
+    elapsed = time.perf_counter() - started
+    after = openai_utils.get_llm_stats()["endpoints"].get(scenario, {})
+    
+    def delta(key):
+        return after.get(key, 0) - before.get(key, 0)
+    
+    fallbacks = delta("failures") + delta("short_circuited")
+    return {
+        "scenario": scenario,
+        "requests": requests,
+        "concurrency": concurrency,
+        "throughput": requests / elapsed,
+        "p50": float(np.percentile(latencies, 50)),
+        "p95": float(np.percentile(latencies, 95)),
+        "p99": float(np.percentile(latencies, 99)),
+        "max": float(latencies.max()),
+        "ai_answers": delta("successes"),
+        "fallbacks": fallbacks,
+        "fallback_rate": fallbacks / requests,
+        "retries": delta("retries"),
+        "short_circuited": delta("short_circuited")
+    }
+
+def print_report(results, circuit):
+    print(f"{'scenario':<24}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}{'AI':>6}{'fallback':>10}{'retries':>9}")
+    for result in results:
+        print(
+            f"{result['scenario']:<24}{result['throughput']:>9.1f}"
+            f"{result['p50'] * 1000:>9.0f}{result['p95'] * 1000:>9.0f}{result['p99'] * 1000:>9.0f}{result['max'] * 1000:>9.0f}"
+            f"{result['ai_answers']:>6}{result['fallbacks']:>10}{result['retries']:>9}"
+        )
+    print(f"Circuit breaker: {circuit}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the Finance Assistant AI features against a local stub server.")
+    parser.add_argument("--scenario", choices=SCENARIOS + ["all"], default="all")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--expenses", type=int, default=500, help="expense history size for insight and budget requests")
+    parser.add_argument("--batch-size", type=int, default=50, help="descriptions per batch categorization request")
+    parser.add_argument("--base-url", help="use a running OpenAI-compatible server instead of starting the stub")
+    parser.add_argument("--latency", type=float, default=0.05, help="stub latency in seconds")
+    parser.add_argument("--jitter", type=float, default=0.05, help="stub latency jitter in seconds")
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="stub delay between streamed chunks in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of stub requests that fail")
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument("--max-p95", type=float, help="exit with status 1 if any scenario's p95 latency exceeds this many seconds")
+    parser.add_argument("--max-fallback-rate", type=float, help="exit with status 1 if any scenario's fallback rate exceeds this")
+    args = parser.parse_args()
+    
+    stub = None
+    if args.base_url:
+        base_url = args.base_url
+    else:
+        stub = StubServer(
+            latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, error_status=args.error_status,
+            chunk_delay=args.chunk_delay
+        ).start()
+        base_url = stub.base_url
+    
+    # The AI client and database engine are configured from the environment at import time
+    workdir = tempfile.TemporaryDirectory()
+    os.environ["OPENAI_BASE_URL"] = base_url
+    if not args.base_url or "OPENAI_API_KEY" not in os.environ:
+        os.environ["OPENAI_API_KEY"] = "stub-key"
+    os.environ["FINANCE_DB_PATH"] = os.path.join(workdir.name, "load_test.db")
+    
+    from utils.database import init_db
+    import utils.openai_utils as openai_utils
+    init_db()
+    # One INFO line per HTTP request would drown the report
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    
+    expenses = sample_expenses(args.expenses)
+    scenarios = SCENARIOS if args.scenario == "all" else [args.scenario]
+    results = [
+        run_scenario(scenario, openai_utils, args.requests, args.concurrency, expenses, args.batch_size)
+        for scenario in scenarios
+    ]
+    circuit = openai_utils.get_llm_stats()["circuit"]
+    
+    if args.json:
+        print(json.dumps({"results": results, "circuit": circuit, "stub": stub.stats if stub else None}, indent=2))
+    else:
+        print_report(results, circuit)
+    
+    if stub:
+        stub.stop()
+    
+    failed = [
+        result["scenario"] for result in results
+        if (args.max_p95 is not None and result["p95"] > args.max_p95)
+        or (args.max_fallback_rate is not None and result["fallback_rate"] > args.max_fallback_rate)
+    ]
+    if failed:
+        print(f"Thresholds exceeded for: {', '.join(failed)}", file=sys.stderr)
+        sys.exit(1)
@@ -0,0 +1,223 @@
+"""
+Local OpenAI-compatible stub server for exercising the AI features without an API key.
+
+Point the app at it with OPENAI_BASE_URL=http://127.0.0.1:<port>/v1 and any
+OPENAI_API_KEY. Responses are canned per request kind, with configurable
+latency and error rate, and are streamed when a request asks for it;
+GET /stats returns request counters.
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+# Canned answers by request kind; override them with --responses
+DEFAULT_RESPONSES = {
+    "categorize": "Food",
+    "categorize_batch": "Food",
+    "spending_insights": {
+        "insights": [
+            "Food is your largest category; planning meals could cut it noticeably.",
+            "Several small recurring charges add up each month; review your subscriptions.",
+            "Spending rose compared with your recent average; check the categories driving it."
+        ]
+    },
+    "saving_recommendations": {
+        "recommendations": [
+            "Set a weekly grocery limit and track it.",
+            "Cancel subscriptions you have not used in the last month.",
+            "Move a fixed amount to savings on payday."
+        ]
+    },
+    "budget_recommendations": {
+        "Housing": 1500, "Food": 500, "Transportation": 250, "Entertainment": 150, "Savings/Investment": 600
+    }
+}
+
+def request_kind(body):
+    """Work out which app feature sent a chat completion request from its system prompt."""
+    system = " ".join(message.get("content", "") for message in body.get("messages", []) if message.get("role") == "system")
+    if "categorizes expenses" in system:
+        return "categorize_batch" if "numbered" in system else "categorize"
+    if "analyzing spending patterns" in system:
+        return "spending_insights"
+    if "savings recommendations" in system:
+        return "saving_recommendations"
+    if "budget recommendations" in system:
+        return "budget_recommendations"
+    return "unknown"
+
+class StubServer:
+    """
+    OpenAI-compatible chat completions stub.
+    
+    Each request waits latency seconds plus up to jitter seconds, then fails
+    with error_status at error_rate probability or returns the canned
+    response for its kind. Streamed responses are sent a few words per
+    chunk, chunk_delay seconds apart.
+    """
+    
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, jitter=0.0, error_rate=0.0, error_status=500, responses=None,
+                 chunk_delay=0.0):
+        self.latency = latency
+        self.chunk_delay = chunk_delay
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.responses = dict(DEFAULT_RESPONSES, **(responses or {}))
+        self.stats = {}
+        self._stats_lock = threading.Lock()
+        self.httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self.httpd.daemon_threads = True
+        self._thread = None
+    
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+    
+    def _count(self, kind, outcome):
+        with self._stats_lock:
+            kind_stats = self.stats.setdefault(kind, {"requests": 0, "errors": 0})
+            kind_stats["requests"] += 1
+            if outcome == "error":
+                kind_stats["errors"] += 1
+    
+    def completion_content(self, kind, body):
+        """The assistant message text for a request."""
+        answer = self.responses.get(kind, {})
+        if kind == "categorize_batch":
+            user_text = " ".join(message.get("content", "") for message in body["messages"] if message.get("role") == "user")
+            numbers = re.findall(r"^(\d+):", user_text, flags=re.MULTILINE)
+            return json.dumps({"categories": {number: answer for number in numbers}})
+        if kind == "spending_insights":
+            # Insights are requested as one JSON object per line
+            return "\n".join(json.dumps({"insight": insight}) for insight in answer.get("insights", []))
+        return answer if isinstance(answer, str) else json.dumps(answer)
+    
+    def _handler_class(self):
+        server = self
+        
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+            
+            def _send_json(self, status, payload):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                try:
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client gave up (timed out) before the response was ready
+                    pass
+            
+            def _send_stream(self, body, content):
+                """Send content as server-sent chat.completion.chunk events, a few words at a time."""
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+                words = re.findall(r"\S+\s*|\s+", content)
+                pieces = ["".join(words[start:start + 4]) for start in range(0, len(words), 4)]
+                completion_id = f"chatcmpl-stub-{random.getrandbits(32):08x}"
+                try:
+                    for index, piece in enumerate(pieces + [None]):
+                        if index:
+                            time.sleep(server.chunk_delay)
+                        chunk = {
+                            "id": completion_id,
+                            "object": "chat.completion.chunk",
+                            "created": int(time.time()),
+                            "model": body.get("model", "gpt-4o"),
+                            "choices": [{
+                                "index": 0,
+                                "delta": {"content": piece} if piece is not None else {},
+                                "finish_reason": None if piece is not None else "stop"
+                            }]
+                        }
+                        self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                        self.wfile.flush()
+                    self.wfile.write(b"data: [DONE]\n\n")
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+            
+            def do_GET(self):
+                if self.path.rstrip("/") == "/stats":
+                    with server._stats_lock:
+                        self._send_json(200, server.stats)
+                else:
+                    self._send_json(404, {"error": {"message": "Not found"}})
+            
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                body = json.loads(self.rfile.read(length) or b"{}")
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._send_json(404, {"error": {"message": "Not found"}})
+                    return
+                
+                kind = request_kind(body)
+                time.sleep(server.latency + random.uniform(0, server.jitter))
+                if random.random() < server.error_rate:
+                    server._count(kind, "error")
+                    self._send_json(server.error_status, {"error": {"message": "Stub server error", "type": "server_error"}})
+                    return
+                
+                server._count(kind, "ok")
+                if body.get("stream"):
+                    self._send_stream(body, server.completion_content(kind, body))
+                    return
+                self._send_json(200, {
+                    "id": f"chatcmpl-stub-{random.getrandbits(32):08x}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": body.get("model", "gpt-4o"),
+                    "choices": [{
+                        "index": 0,
+                        "finish_reason": "stop",
+                        "message": {"role": "assistant", "content": server.completion_content(kind, body)}
+                    }],
+                    "usage": {"prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+                })
+        
+        return Handler
+    
+    def start(self):
+        """Serve in a background thread and return the server."""
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="ai-stub", daemon=True)
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local OpenAI-compatible stub server for the Finance Assistant.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every response")
+    parser.add_argument("--jitter", type=float, default=0.0, help="up to this many extra random seconds per response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests that fail")
+    parser.add_argument("--error-status", type=int, default=500, help="HTTP status of failed requests, e.g. 500 or 429")
+    parser.add_argument("--chunk-delay", type=float, default=0.0, help="seconds between chunks of streamed responses")
+    parser.add_argument("--responses", help="JSON file of canned responses by request kind, overriding the defaults")
+    args = parser.parse_args()
+    
+    responses = None
+    if args.responses:
+        with open(args.responses) as f:
+            responses = json.load(f)
+    
+    stub = StubServer(
+        args.host, args.port, args.latency, args.jitter, args.error_rate, args.error_status, responses, args.chunk_delay
+    )
+    print(f"Stub server listening on {stub.base_url}")
+    try:
+        stub.httpd.serve_forever()
+    except KeyboardInterrupt:
+        stub.stop()
@@ -0,0 +1,191 @@
+"""
+Benchmark the vectorized analytics helpers on large synthetic expense histories.
+
+Each benchmark times a current code path and the per-row pandas code it
+replaced on the same data, checks that both give the same answer, and
+reports the speedup. Old paths too slow to run at full size run on the
+first --baseline-rows rows and their time is scaled up linearly.
+"""
+import argparse
+import json
+import random
+import string
+import time
+
+import numpy as np
+import pandas as pd
+
+from utils.data_utils import EXPENSE_CATEGORIES, ExpenseStore, bucket_period_starts, encode_categories
+from utils.openai_utils import KEYWORD_CATEGORIES, keyword_classifier
+
+BENCHMARKS = ["periods", "categories", "keywords"]
+PERIODS = ["day", "week", "month", "quarter", "year"]
+
+def sample_columns(rows, seed=0):
+    """Random expense columns shaped like get_expense_columns() results, spread over five years."""
+    rng = np.random.default_rng(seed)
+    return {
+        "id": np.arange(1, rows + 1, dtype=np.int64),
+        "date": np.sort(np.datetime64("2020-01-01") + rng.integers(0, 5 * 365, rows).astype("timedelta64[D]")),
+        "amount_cents": rng.integers(100, 50000, rows, dtype=np.int64),
+        "category": np.array(EXPENSE_CATEGORIES, dtype=object)[rng.integers(0, len(EXPENSE_CATEGORIES), rows)],
+        "description": np.array([f"Merchant {number}" for number in rng.integers(0, 1000, rows)], dtype=object)
+    }
+
+def best_time(function, repeat):
+    """Fastest of repeat runs of function(), in seconds, and its last result."""
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        best = min(best, time.perf_counter() - started)
+    return best, result
+
+def _legacy_period_starts(dates, period):
+    """The per-row pandas bucketing that get_expenses_by_date used before bucket_period_starts."""
+    series = pd.Series(pd.to_datetime(dates))
+    if period == "day":
+        return series.dt.date
+    frequency = {"week": "W", "month": "M", "quarter": "Q", "year": "Y"}[period]
+    return series.dt.to_period(frequency).apply(lambda x: x.start_time.date())
+
+def benchmark_periods(columns, baseline_rows, repeat):
+    """bucket_period_starts against to_period().apply() for every period."""
+    rows = len(columns["date"])
+    baseline_dates = columns["date"][:baseline_rows]
+    results = []
+    for period in PERIODS:
+        # to_period("W") weeks run Monday to Sunday, so compare Monday-start weeks
+        seconds, _ = best_time(lambda: bucket_period_starts(columns["date"], period, week_start=0), repeat)
+        baseline_seconds, legacy = best_time(lambda: _legacy_period_starts(baseline_dates, period), 1)
+        expected = np.array(legacy.tolist(), dtype="datetime64[D]")
+        if not np.array_equal(bucket_period_starts(baseline_dates, period, week_start=0), expected):
+            raise AssertionError(f"bucket_period_starts disagrees with the old bucketing for {period}")
+        results.append(_result("periods", period, rows, seconds, baseline_seconds * rows / len(baseline_dates)))
+    return results
+
+def _megabytes(frame):
+    return frame.memory_usage(deep=True, index=False).sum() / 1e6
+
+def benchmark_categories(columns, repeat):
+    """Category totals from int16 codes against a groupby over category strings, and the frame memory saved."""
+    rows = len(columns["category"])
+    codes, categories = encode_categories(columns["category"])
+    object_frame = pd.DataFrame({"category": columns["category"], "amount_cents": columns["amount_cents"]})
+    categorical_frame = pd.DataFrame({
+        "category": pd.Categorical.from_codes(codes, categories),
+        "amount_cents": columns["amount_cents"]
+    })
+    store = ExpenseStore.from_columns(columns)
+    
+    baseline_seconds, expected = best_time(lambda: object_frame.groupby("category")["amount_cents"].sum(), repeat)
+    expected = {category: cents / 100 for category, cents in expected.items()}
+    memory = (
+        f"category column {_megabytes(object_frame[['category']]):.1f} MB -> {_megabytes(categorical_frame[['category']]):.1f} MB, "
+        f"frame {_megabytes(object_frame):.1f} MB -> {_megabytes(categorical_frame):.1f} MB"
+    )
+    
+    seconds, totals = best_time(lambda: categorical_frame.groupby("category", observed=True)["amount_cents"].sum(), repeat)
+    if {category: cents / 100 for category, cents in totals.items()} != expected:
+        raise AssertionError("Categorical groupby totals differ from the string groupby")
+    results = [_result("categories", "categorical groupby", rows, seconds, baseline_seconds, memory)]
+    
+    seconds, totals = best_time(store.category_totals, repeat)
+    if totals != expected:
+        raise AssertionError("ExpenseStore.category_totals differs from the string groupby")
+    results.append(_result("categories", "category_totals bincount", rows, seconds, baseline_seconds))
+    
+    seconds, _ = best_time(lambda: encode_categories(columns["category"]), repeat)
+    results.append(_result("categories", "encode_categories", rows, seconds, seconds, "one-off cost per load"))
+    return results
+
+def sample_descriptions(rows, dense=False, seed=0):
+    """
+    Random expense descriptions: merchant-style text with an occasional
+    keyword, or keyword-dense text with keywords and letter fragments run together.
+    """
+    rng = random.Random(seed)
+    keywords = [keyword for _, category_keywords in KEYWORD_CATEGORIES for keyword in category_keywords]
+    words = ["POS", "PURCHASE", "STORE", "MKTP", "ONLINE", "PAYMENT", "DEBIT", "CARD", "REF", "LLC", "INC", "CO"]
+    descriptions = []
+    for _ in range(rows):
+        if dense:
+            parts = [
+                rng.choice(keywords) if rng.random() < 0.7 else "".join(rng.choices(string.ascii_lowercase, k=2))
+                for _ in range(rng.randint(1, 4))
+            ]
+            descriptions.append(rng.choice(["", " "]).join(parts))
+        else:
+            parts = rng.choices(words, k=rng.randint(2, 4)) + [f"#{rng.randint(1000, 9999)}"]
+            if rng.random() < 0.3:
+                parts.insert(rng.randint(0, len(parts)), rng.choice(keywords).upper())
+            descriptions.append(" ".join(parts))
+    return descriptions
+
+def _legacy_keyword_category(description):
+    """The substring chain keyword_category used before KeywordClassifier."""
+    description = description.lower()
+    for category, keywords in KEYWORD_CATEGORIES:
+        if any(keyword in description for keyword in keywords):
+            return category
+    return "Other"
+
+def benchmark_keywords(rows, repeat):
+    """
+    KeywordClassifier.classify_many against the old substring chain, on
+    merchant-style and keyword-dense text.
+    """
+    results = []
+    for case, dense in [("merchant text", False), ("keyword-dense text", True)]:
+        descriptions = sample_descriptions(rows, dense)
+        seconds, categories = best_time(lambda: keyword_classifier.classify_many(descriptions), repeat)
+        baseline_seconds, expected = best_time(lambda: [_legacy_keyword_category(text) for text in descriptions], repeat)
+        if categories != expected:
+            raise AssertionError(f"KeywordClassifier disagrees with the old keyword chain on {case}")
+        results.append(_result("keywords", case, rows, seconds, baseline_seconds))
+    return results
+
+def _result(benchmark, case, rows, seconds, baseline_seconds, detail=""):
+    return {
+        "benchmark": benchmark,
+        "case": case,
+        "rows": rows,
+        "seconds": seconds,
+        "baseline_seconds": baseline_seconds,
+        "speedup": baseline_seconds / seconds if seconds else float("inf"),
+        "detail": detail
+    }
+
+def print_report(results):
+    print(f"{'benchmark':<12}{'case':<24}{'rows':>10}{'ms':>10}{'old ms':>12}{'speedup':>9}  detail")
+    for result in results:
+        print(
+            f"{result['benchmark']:<12}{result['case']:<24}{result['rows']:>10}"
+            f"{result['seconds'] * 1000:>10.1f}{result['baseline_seconds'] * 1000:>12.1f}{result['speedup']:>8.0f}x  {result['detail']}"
+        )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the Finance Assistant analytics helpers on synthetic data.")
+    parser.add_argument("--benchmark", choices=BENCHMARKS + ["all"], default="all")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="expenses in the synthetic history")
+    parser.add_argument("--baseline-rows", type=int, default=50_000, help="rows the slow old code paths run on before scaling")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per timing; the fastest counts")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+    
+    columns = sample_columns(args.rows)
+    baseline_rows = min(args.baseline_rows, args.rows)
+    benchmarks = BENCHMARKS if args.benchmark == "all" else [args.benchmark]
+    results = []
+    for benchmark in benchmarks:
+        if benchmark == "periods":
+            results += benchmark_periods(columns, baseline_rows, args.repeat)
+        elif benchmark == "categories":
+            results += benchmark_categories(columns, args.repeat)
+        elif benchmark == "keywords":
+            results += benchmark_keywords(args.rows, args.repeat)
+    
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_report(results)
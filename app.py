@@ -3,6 +3,8 @@ import pandas as pd
 import os
 from datetime import datetime
 import json
+import tempfile
+from functools import partial
 
 # Import components
 from components.dashboard import show_dashboard
@@ -15,11 +17,16 @@ from components.login import show_login_page
 # Import database utilities
 from utils.database import (
     init_db, get_all_expenses, get_all_budgets, 
-    get_all_goals, get_insights, export_data, import_data
+    get_all_goals, get_insights, import_data, write_export_json,
+    merge_import
 )
+from utils.import_utils import iter_import_records, fill_missing_categories
+from utils.openai_utils import categorize_expenses_batch
+from utils.data_utils import ExpenseAggregates
+from utils.insight_jobs import get_insight_job
 
 # Import authentication utilities
-from utils.auth import clerk_auth, initialize_auth, show_user_profile, logout_button
+from utils.auth import clerk_auth, initialize_auth, show_user_profile, logout_button, get_current_user_id
 
 # Import UI utilities
 from utils.ui_utils import (
@@ -53,18 +60,37 @@ except:
 # Initialize database
 init_db()
 
+# Reload the session's data whenever a different user signs in
+user_id = get_current_user_id()
+if st.session_state.get("data_user_id") != user_id:
+    st.session_state.data_user_id = user_id
+    for key in ["expenses", "expense_aggregates", "budgets", "goals", "financial_insights", "saving_recommendations", "insight_job_completed"]:
+        st.session_state.pop(key, None)
+
 # Initialize session state
 if "expenses" not in st.session_state:
-    st.session_state.expenses = get_all_expenses()
+    st.session_state.expenses = get_all_expenses(user_id)
+
+# Running totals for the sidebar, dashboard and budget pages, updated as expenses change
+if "expense_aggregates" not in st.session_state:
+    st.session_state.expense_aggregates = ExpenseAggregates(st.session_state.expenses)
     
 if "budgets" not in st.session_state:
-    st.session_state.budgets = get_all_budgets()
+    st.session_state.budgets = get_all_budgets(user_id)
     
 if "goals" not in st.session_state:
-    st.session_state.goals = get_all_goals()
+    st.session_state.goals = get_all_goals(user_id)
     
 if "financial_insights" not in st.session_state:
-    st.session_state.financial_insights = get_insights()
+    st.session_state.financial_insights = get_insights(user_id)
+
+# Pick up insights finished by the background worker since the last rerun
+insight_job = get_insight_job(user_id)
+if insight_job["completed"] > st.session_state.get("insight_job_completed", 0):
+    st.session_state.insight_job_completed = insight_job["completed"]
+    if insight_job["insights"] is not None:
+        st.session_state.financial_insights = insight_job["insights"]
+        st.session_state.saving_recommendations = insight_job["recommendations"]
     
 if "current_page" not in st.session_state:
     st.session_state.current_page = "Dashboard"
@@ -144,7 +170,7 @@ with st.sidebar:
     # Calculate totals for sidebar display
     total_expenses = 0
     if st.session_state.expenses:
-        total_expenses = sum(float(expense["amount"]) for expense in st.session_state.expenses)
+        total_expenses = st.session_state.expense_aggregates.total
         
         col1, col2 = st.columns([1, 4])
         with col1:
@@ -230,30 +256,62 @@ with st.sidebar:
         st.markdown(get_icon("analysis"), unsafe_allow_html=True)
     with col2:
         if st.button("Export Data", key="export_data_button", use_container_width=True):
-            # Export data from the database
-            data = export_data()
-            
-            st.download_button(
-                label="Download Finance Data",
-                data=json.dumps(data, indent=2),
-                file_name="finance_data.json",
-                mime="application/json"
-            )
+            # Stream the export from the database into a temporary file, so it is
+            # never held as dicts plus a json.dumps string. Streamlit has no way to
+            # serve a file in pieces: download_button reads it into one bytes object,
+            # so peak memory is still about one copy of the export, not flat
+            export_file = tempfile.NamedTemporaryFile(suffix=".json", delete=False)
+            try:
+                with export_file:
+                    write_export_json(export_file, user_id=user_id)
+                with open(export_file.name, "rb") as export_data_file:
+                    st.download_button(
+                        label="Download Finance Data",
+                        data=export_data_file,
+                        file_name="finance_data.json",
+                        mime="application/json"
+                    )
+            finally:
+                os.unlink(export_file.name)
             notification("Data ready for download!", "success")
     
     # Import data
-    uploaded_file = st.file_uploader("Import saved data", type=["json"])
+    uploaded_file = st.file_uploader("Import saved data", type=["json", "csv"])
+    import_mode = st.radio(
+        "Import mode",
+        ["Merge changes", "Replace all data"],
+        horizontal=True,
+        help="Merge adds new and changed rows and keeps existing data. Replace clears the database first."
+    )
     if uploaded_file is not None:
         try:
-            data = json.load(uploaded_file)
-            # Import data to the database
-            if import_data(data):
+            if import_mode == "Merge changes" or uploaded_file.name.lower().endswith(".csv"):
+                # Stream the upload row by row, categorizing uncategorized rows in batches,
+                # and upsert only what changed
+                records = fill_missing_categories(
+                    iter_import_records(uploaded_file),
+                    partial(categorize_expenses_batch, user_id=user_id)
+                )
+                counts = merge_import(records, user_id)
+                imported = True
+                import_message = (
+                    f"Data merged: {counts['inserted']} inserted, "
+                    f"{counts['updated']} updated, {counts['skipped']} unchanged."
+                )
+            else:
+                data = json.load(uploaded_file)
+                # Import data to the database
+                imported = import_data(data, user_id)
+                import_message = "Data imported successfully!"
+            
+            if imported:
                 # Refresh session state
-                st.session_state.expenses = get_all_expenses()
-                st.session_state.budgets = get_all_budgets()
-                st.session_state.goals = get_all_goals()
-                st.session_state.financial_insights = get_insights()
-                notification("Data imported successfully!", "success")
+                st.session_state.expenses = get_all_expenses(user_id)
+                st.session_state.expense_aggregates = ExpenseAggregates(st.session_state.expenses)
+                st.session_state.budgets = get_all_budgets(user_id)
+                st.session_state.goals = get_all_goals(user_id)
+                st.session_state.financial_insights = get_insights(user_id)
+                notification(import_message, "success")
                 st.rerun()
         except Exception as e:
             notification(f"Error importing data: {e}", "error")
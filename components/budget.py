@@ -5,6 +5,7 @@ from datetime import datetime
 from utils.openai_utils import get_budget_recommendations
 from utils.data_utils import calculate_budget_progress, get_expenses_by_category, get_this_month_expenses
 from utils.visualization import create_budget_progress_chart
+from utils.auth import get_current_user_id
 
 def show_budget():
     """
@@ -99,12 +100,17 @@ def show_budget_progress():
         return
     
     # Calculate budget progress
-    budget_progress = calculate_budget_progress(st.session_state.expenses, st.session_state.budgets)
+    budget_progress = calculate_budget_progress(
+        None,
+        st.session_state.budgets,
+        get_current_user_id(),
+        monthly_expenses=st.session_state.expense_aggregates.get_category_totals(datetime.now().strftime("%Y-%m"))
+    )
     
     # Show budget chart
     st.subheader("Budget Progress")
     st.plotly_chart(
-        create_budget_progress_chart(st.session_state.expenses, st.session_state.budgets),
+        create_budget_progress_chart(budgets=st.session_state.budgets, user_id=get_current_user_id()),
         use_container_width=True
     )
     
@@ -3,8 +3,9 @@ import pandas as pd
 from datetime import datetime, timedelta
 import calendar
 
-from utils.data_utils import get_expense_dataframe, get_expenses_by_category, calculate_budget_progress, get_this_month_expenses
+from utils.data_utils import get_expense_dataframe, get_expenses_by_category, calculate_budget_progress, get_current_month_range
 from utils.visualization import create_spending_by_category_chart, create_spending_over_time_chart, create_budget_progress_chart
+from utils.auth import get_current_user_id
 
 def show_dashboard():
     """
@@ -49,18 +50,20 @@ def show_dashboard():
         """)
         return
     
+    user_id = get_current_user_id()
+    
     # Summary metrics
     col1, col2, col3, col4 = st.columns(4)
     
-    # Calculate total expenses
-    total_expenses = sum(float(expense["amount"]) for expense in st.session_state.expenses)
-    
-    # Calculate this month's expenses
-    this_month_expenses = get_this_month_expenses(st.session_state.expenses)
-    month_total = sum(float(expense["amount"]) for expense in this_month_expenses)
+    # Read the running totals kept in session state
+    aggregates = st.session_state.expense_aggregates
+    total_expenses = aggregates.total
     
     # Get today's date
     today = datetime.now()
+    
+    # Calculate this month's expenses
+    month_total = aggregates.get_month_total(today.strftime("%Y-%m"))
     current_month = today.strftime("%B %Y")
     
     # Calculate daily average for this month
@@ -143,7 +146,7 @@ def show_dashboard():
                 <div class="metric-card-shimmer"></div>
                 <div class="metric-card-content">
                     <div class="metric-label">Transactions</div>
-                    <div class="metric-value">{len(st.session_state.expenses)}</div>
+                    <div class="metric-value">{aggregates.count}</div>
                 </div>
                 <div class="metric-icon">🧾</div>
             </div>
@@ -157,20 +160,24 @@ def show_dashboard():
     col1, col2 = st.columns(2)
     
     with col1:
+        start_of_month, end_of_month = get_current_month_range()
         st.plotly_chart(
-            create_spending_by_category_chart(this_month_expenses),
+            create_spending_by_category_chart(
+                filters={"start_date": start_of_month, "end_date": end_of_month},
+                user_id=user_id
+            ),
             use_container_width=True
         )
     
     with col2:
         time_period = st.selectbox(
             "Time Period",
-            ["week", "month", "year"],
+            ["week", "month", "quarter", "year"],
             index=1,
             key="time_period_selector"
         )
         st.plotly_chart(
-            create_spending_over_time_chart(st.session_state.expenses, time_period),
+            create_spending_over_time_chart(period=time_period, user_id=user_id),
             use_container_width=True
         )
     
@@ -179,7 +186,7 @@ def show_dashboard():
         st.markdown("---")
         st.subheader("Budget Progress")
         st.plotly_chart(
-            create_budget_progress_chart(st.session_state.expenses, st.session_state.budgets),
+            create_budget_progress_chart(budgets=st.session_state.budgets, user_id=user_id),
             use_container_width=True
         )
     
@@ -199,7 +206,7 @@ def show_dashboard():
         df = pd.DataFrame(recent_expenses)
         df = df[["date", "description", "category", "amount"]]
         df.columns = ["Date", "Description", "Category", "Amount"]
-        df["Amount"] = df["Amount"].apply(lambda x: f"${float(x):.2f}")
+        df["Amount"] = df["Amount"].apply(lambda x: f"${x:.2f}")
         
         st.table(df)
     else:
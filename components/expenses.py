@@ -3,9 +3,12 @@ import pandas as pd
 from datetime import datetime
 import plotly.express as px
 
-from utils.openai_utils import categorize_expense, analyze_spending_patterns
-from utils.data_utils import get_expense_dataframe, get_expenses_by_category
+from utils.openai_utils import categorize_expense
+from utils.insight_jobs import submit_insight_job
+from utils.database import add_expense, delete_expense, get_expenses_page
+from utils.data_utils import EXPENSE_CATEGORIES, get_expense_dataframe, get_expenses_by_category
 from utils.visualization import create_spending_by_category_chart, create_category_comparison_chart
+from utils.auth import get_current_user_id
 
 def show_expenses():
     """
@@ -43,12 +46,7 @@ def show_add_expense_form():
             use_ai_category = st.checkbox("Use AI to categorize", value=True)
             
             if not use_ai_category:
-                category_options = [
-                    "Housing", "Transportation", "Food", "Entertainment", 
-                    "Shopping", "Health", "Education", "Travel", 
-                    "Savings/Investment", "Other"
-                ]
-                category = st.selectbox("Category", category_options)
+                category = st.selectbox("Category", EXPENSE_CATEGORIES)
             else:
                 category = "AI will categorize"
         
@@ -58,7 +56,7 @@ def show_add_expense_form():
         if submitted:
             if use_ai_category:
                 with st.spinner("AI is categorizing your expense..."):
-                    category = categorize_expense(description, amount)
+                    category = categorize_expense(description, amount, get_current_user_id())
             
             # Create new expense entry
             new_expense = {
@@ -68,13 +66,14 @@ def show_add_expense_form():
                 "category": category
             }
             
-            # Add to session state
-            st.session_state.expenses.append(new_expense)
+            # Save to the database so aggregate queries see it, then add to session state
+            saved_expense = add_expense(new_expense, get_current_user_id())
+            st.session_state.expenses.append(saved_expense)
+            st.session_state.expense_aggregates.add(saved_expense)
             
-            # Update AI insights if we have enough data
+            # Refresh AI insights in the background if we have enough data
             if len(st.session_state.expenses) >= 5:
-                with st.spinner("Analyzing spending patterns..."):
-                    st.session_state.financial_insights = analyze_spending_patterns(st.session_state.expenses)
+                submit_insight_job(get_current_user_id(), budgets=st.session_state.budgets)
             
             st.success(f"Added expense: {description} (${amount:.2f}) in {category} category")
             
@@ -108,115 +107,94 @@ def show_expense_list():
             min_amount = st.number_input("Min Amount", min_value=0.0, step=10.0)
             max_amount = st.number_input("Max Amount", min_value=0.0, step=10.0, value=1000.0)
     
-    # Apply filters
-    filtered_expenses = st.session_state.expenses.copy()
+    user_id = get_current_user_id()
     
-    # Date filter
-    filtered_expenses = [
-        expense for expense in filtered_expenses
-        if start_date.strftime("%Y-%m-%d") <= expense["date"] <= end_date.strftime("%Y-%m-%d")
-    ]
+    # Build the filters applied by the database
+    filters = {
+        "start_date": start_date,
+        "end_date": end_date,
+        "category": selected_category
+    }
+    if min_amount > 0 or max_amount < 1000:
+        filters["min_amount"] = min_amount
+        filters["max_amount"] = max_amount
     
-    # Category filter
-    if selected_category != "All":
-        filtered_expenses = [
-            expense for expense in filtered_expenses
-            if expense["category"] == selected_category
-        ]
+    # Pagination state: a stack of cursors, one per page visited
+    page_size = 10
+    filters_key = repr(sorted(filters.items()))
+    if st.session_state.get("expense_filters_key") != filters_key or "expense_page_cursors" not in st.session_state:
+        st.session_state.expense_filters_key = filters_key
+        st.session_state.expense_page_cursors = [None]
     
-    # Amount filter
-    if min_amount > 0 or max_amount < 1000:
-        filtered_expenses = [
-            expense for expense in filtered_expenses
-            if min_amount <= float(expense["amount"]) <= max_amount
-        ]
-    
-    # Sort expenses by date (most recent first)
-    filtered_expenses = sorted(
-        filtered_expenses,
-        key=lambda x: datetime.strptime(x["date"], "%Y-%m-%d"),
-        reverse=True
-    )
+    page = get_expenses_page(filters, st.session_state.expense_page_cursors[-1], page_size, user_id)
     
     # Display summary
     st.subheader("Expense Summary")
     
     # Total in filtered view
-    filtered_total = sum(float(expense["amount"]) for expense in filtered_expenses)
-    st.markdown(f"**Total in current view:** ${filtered_total:.2f}")
+    st.markdown(f"**Total in current view:** ${page['total_amount']:.2f}")
     
     # Charts
     col1, col2 = st.columns(2)
     
     with col1:
         st.plotly_chart(
-            create_spending_by_category_chart(filtered_expenses),
+            create_spending_by_category_chart(filters=filters, user_id=user_id),
             use_container_width=True
         )
     
     with col2:
         st.plotly_chart(
-            create_category_comparison_chart(filtered_expenses),
+            create_category_comparison_chart(filters=filters, user_id=user_id),
             use_container_width=True
         )
     
     # Expense table with pagination
     st.subheader("Expense List")
     
-    # Convert to dataframe for display
-    if filtered_expenses:
-        df = pd.DataFrame(filtered_expenses)
+    if page["expenses"]:
+        df = pd.DataFrame(page["expenses"])
         df = df[["date", "description", "category", "amount"]]
         df.columns = ["Date", "Description", "Category", "Amount"]
-        df["Amount"] = df["Amount"].apply(lambda x: f"${float(x):.2f}")
-        
-        # Pagination
-        page_size = 10
-        total_pages = (len(df) + page_size - 1) // page_size
+        df["Amount"] = df["Amount"].apply(lambda x: f"${x:.2f}")
         
-        if "expense_page" not in st.session_state:
-            st.session_state.expense_page = 0
+        total_pages = max(1, (page["total_count"] + page_size - 1) // page_size)
+        page_number = len(st.session_state.expense_page_cursors)
         
         # Page navigation
         col1, col2, col3 = st.columns([1, 3, 1])
         
         with col1:
-            if st.button("Previous", disabled=st.session_state.expense_page <= 0):
-                st.session_state.expense_page -= 1
+            if st.button("Previous", disabled=page_number <= 1):
+                st.session_state.expense_page_cursors.pop()
                 st.rerun()
         
         with col2:
-            if total_pages > 0:
-                st.markdown(f"**Page {st.session_state.expense_page + 1} of {total_pages}**")
-            else:
-                st.markdown("**Page 1 of 1**")
+            st.markdown(f"**Page {page_number} of {total_pages}**")
         
         with col3:
-            if st.button("Next", disabled=st.session_state.expense_page >= total_pages - 1):
-                st.session_state.expense_page += 1
+            if st.button("Next", disabled=page["next_cursor"] is None):
+                st.session_state.expense_page_cursors.append(page["next_cursor"])
                 st.rerun()
         
         # Display current page
-        start_idx = st.session_state.expense_page * page_size
-        end_idx = min(start_idx + page_size, len(df))
-        st.table(df.iloc[start_idx:end_idx])
+        st.table(df)
         
         # Delete expenses
         st.subheader("Delete Expenses")
         expense_to_delete = st.selectbox(
             "Select expense to delete",
-            [f"{e['date']} - {e['description']} - ${float(e['amount']):.2f}" for e in st.session_state.expenses]
+            page["expenses"],
+            format_func=lambda e: f"{e['date']} - {e['description']} - ${e['amount']:.2f}"
         )
         
         if st.button("Delete Selected Expense", type="primary"):
-            # Find the expense to delete
-            index_to_delete = [
-                f"{e['date']} - {e['description']} - ${float(e['amount']):.2f}" 
-                for e in st.session_state.expenses
-            ].index(expense_to_delete)
-            
-            # Remove it
-            st.session_state.expenses.pop(index_to_delete)
+            # Remove it from the database and the session
+            if delete_expense(expense_to_delete["id"], user_id):
+                st.session_state.expense_aggregates.remove(expense_to_delete)
+            st.session_state.expenses = [
+                e for e in st.session_state.expenses if e.get("id") != expense_to_delete["id"]
+            ]
             st.success("Expense deleted successfully!")
             st.rerun()
     else:
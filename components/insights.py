@@ -2,9 +2,12 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime
 
-from utils.openai_utils import analyze_spending_patterns, get_saving_recommendations
-from utils.data_utils import get_expense_dataframe, get_expenses_by_category
+from utils.openai_utils import InsightStreamError, stream_spending_insights
+from utils.insight_jobs import submit_insight_job, get_insight_job
+from utils.data_utils import get_expenses_by_category, get_monthly_breakdown
 from utils.visualization import create_spending_by_category_chart, create_spending_over_time_chart, create_category_comparison_chart
+from utils.auth import get_current_user_id
+from utils.database import DEFAULT_USER_ID, get_all_expenses
 
 def show_insights():
     """
@@ -17,51 +20,49 @@ def show_insights():
         st.info("Add at least 3 expenses to receive AI-powered financial insights.")
         return
     
+    user_id = get_current_user_id()
+    insight_job = get_insight_job(user_id)
+    
     # Add a button to refresh insights
-    if st.button("Generate New Insights"):
-        with st.spinner("Analyzing your financial data..."):
-            # Get spending pattern insights
-            st.session_state.financial_insights = analyze_spending_patterns(st.session_state.expenses)
-            
-            # Get saving recommendations
-            if st.session_state.budgets:
-                st.session_state.saving_recommendations = get_saving_recommendations(
-                    st.session_state.expenses, 
-                    st.session_state.budgets
-                )
-            else:
-                st.session_state.saving_recommendations = [
-                    "Set up budgets to receive personalized saving recommendations."
-                ]
-                
-        st.success("Insights generated successfully!")
-        st.rerun()
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        refresh = st.button("Generate New Insights")
+    with col2:
+        # Unchanged data otherwise reuses the stored results without calling the AI
+        force = st.checkbox("Regenerate even if my data hasn't changed")
+    
+    if insight_job["running"] and not refresh:
+        col1, col2 = st.columns([4, 1])
+        with col1:
+            st.info("Generating new insights in the background. Showing your last results until they are ready.")
+        with col2:
+            # Clicking reruns the page, which picks up finished results
+            st.button("Check again")
+    elif insight_job["error"] and not refresh:
+        st.warning("The last insight update failed. Showing your last results.")
     
     # Display the insights
     st.subheader("Spending Pattern Analysis")
     
-    if "financial_insights" in st.session_state and st.session_state.financial_insights:
+    if refresh or (
+        not st.session_state.get("financial_insights") and not insight_job["running"] and not insight_job["completed"]
+    ):
+        show_streamed_insights(user_id, force=refresh and force)
+        insight_job = get_insight_job(user_id)
+    elif st.session_state.get("financial_insights"):
         for i, insight in enumerate(st.session_state.financial_insights):
             st.markdown(f"💡 **Insight {i+1}:** {insight}")
     else:
-        with st.spinner("Analyzing your spending patterns..."):
-            st.session_state.financial_insights = analyze_spending_patterns(st.session_state.expenses)
-            st.rerun()
+        st.info("Your spending patterns are being analyzed. Insights will appear here shortly.")
     
     # Display saving recommendations
     st.subheader("Saving Recommendations")
     
     if "saving_recommendations" not in st.session_state:
-        with st.spinner("Generating saving recommendations..."):
-            if st.session_state.budgets:
-                st.session_state.saving_recommendations = get_saving_recommendations(
-                    st.session_state.expenses, 
-                    st.session_state.budgets
-                )
-            else:
-                st.session_state.saving_recommendations = [
-                    "Set up budgets to receive personalized saving recommendations."
-                ]
+        if not insight_job["running"] and not insight_job["completed"]:
+            submit_insight_job(user_id, budgets=st.session_state.budgets)
+        st.session_state.saving_recommendations = []
+        st.info("Saving recommendations are being generated. They will appear here shortly.")
     
     for i, recommendation in enumerate(st.session_state.saving_recommendations):
         st.markdown(f"💰 **Tip {i+1}:** {recommendation}")
@@ -72,19 +73,19 @@ def show_insights():
     
     # Category spending
     st.plotly_chart(
-        create_spending_by_category_chart(st.session_state.expenses),
+        create_spending_by_category_chart(user_id=user_id),
         use_container_width=True
     )
     
     # Spending over time
     st.plotly_chart(
-        create_spending_over_time_chart(st.session_state.expenses, "month"),
+        create_spending_over_time_chart(period="month", user_id=user_id),
         use_container_width=True
     )
     
     # Category comparison over time
     st.plotly_chart(
-        create_category_comparison_chart(st.session_state.expenses),
+        create_category_comparison_chart(user_id=user_id),
         use_container_width=True
     )
     
@@ -93,7 +94,7 @@ def show_insights():
     st.subheader("Top Spending Categories")
     
     # Calculate category totals
-    category_totals = get_expenses_by_category(st.session_state.expenses)
+    category_totals = get_expenses_by_category(user_id=user_id)
     
     if category_totals:
         # Convert to dataframe and sort
@@ -137,7 +138,7 @@ def show_insights():
     # Only show if budgets are set
     if st.session_state.budgets:
         # Calculate basic financial health score (0-100)
-        score = calculate_financial_health_score(st.session_state.expenses, st.session_state.budgets)
+        score = calculate_financial_health_score(None, st.session_state.budgets, user_id)
         
         # Display score
         st.markdown(f"### Your Financial Health Score: {score}/100")
@@ -157,33 +158,57 @@ def show_insights():
     else:
         st.info("Set up budgets to see your financial health assessment.")
 
-def calculate_financial_health_score(expenses, budgets):
+def show_streamed_insights(user_id, force=False):
+    """
+    Generate insights and show each one as soon as it arrives, then queue
+    the saving recommendations in the background. If the response breaks
+    off partway, the background job generates a complete set instead.
+    """
+    status = st.empty()
+    status.info("Analyzing your spending patterns...")
+    
+    insights = []
+    try:
+        for insight in stream_spending_insights(get_all_expenses(user_id), user_id, force):
+            if not insights:
+                status.empty()
+            insights.append(insight)
+            st.markdown(f"💡 **Insight {len(insights)}:** {insight}")
+    except InsightStreamError:
+        status.warning("The AI response was cut off. Complete insights are being generated in the background.")
+        st.session_state.financial_insights = insights
+        # Not passing the partial insights makes the job generate and store a complete set
+        submit_insight_job(user_id, force=force, budgets=st.session_state.budgets)
+        return
+    
+    st.session_state.financial_insights = insights
+    # The job stores these insights and generates recommendations; app.py picks up the results on a later rerun
+    submit_insight_job(user_id, force=force, insights=insights, budgets=st.session_state.budgets)
+
+def calculate_financial_health_score(expenses, budgets, user_id=DEFAULT_USER_ID):
     """
     Calculate a simple financial health score based on budget adherence.
     """
     # Initialize score
     score = 50  # Start at middle
     
-    # Get monthly expenses
-    df = get_expense_dataframe(expenses)
-    if df.empty:
+    # Get monthly totals by category
+    monthly_breakdown = get_monthly_breakdown(expenses, user_id=user_id)
+    if not monthly_breakdown:
         return score
     
-    # Add month column
-    df["month"] = pd.to_datetime(df["date"]).dt.strftime("%Y-%m")
-    
     # Get current month
     current_month = datetime.now().strftime("%Y-%m")
     
     # Filter to current month
-    current_df = df[df["month"] == current_month]
+    current_totals = monthly_breakdown.get(current_month)
     
-    if current_df.empty:
+    if not current_totals:
         return score
     
     # Calculate budget adherence
     budget_total = sum(float(budget) for budget in budgets.values())
-    monthly_expenses = current_df["amount"].sum()
+    monthly_expenses = sum(current_totals.values())
     
     if budget_total > 0:
         # Budget adherence affects score (up to ±30 points)
@@ -196,7 +221,7 @@ def calculate_financial_health_score(expenses, budgets):
             score -= min(30, (budget_ratio - 1) * 50)  # Penalize more for being over budget
     
     # Check category distribution (balanced spending is good)
-    category_totals = current_df.groupby("category")["amount"].sum()
+    category_totals = pd.Series(current_totals)
     if len(category_totals) > 3:
         # More diverse categories is better
         score += min(10, len(category_totals) * 2)
@@ -209,8 +234,8 @@ def calculate_financial_health_score(expenses, budgets):
             score -= min(15, (max_category_percent - 50) / 5)
     
     # Consistency in spending (less variation is better)
-    if len(df["month"].unique()) > 1:
-        monthly_totals = df.groupby("month")["amount"].sum()
+    if len(monthly_breakdown) > 1:
+        monthly_totals = pd.Series({month: sum(totals.values()) for month, totals in monthly_breakdown.items()})
         if len(monthly_totals) > 1:
             variation = monthly_totals.std() / monthly_totals.mean() if monthly_totals.mean() > 0 else 0
             if variation < 0.2:
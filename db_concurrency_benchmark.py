@@ -0,0 +1,154 @@
+"""
+Benchmark concurrent database readers and writers under different SQLite journal modes.
+
+Compares the WAL + synchronous=NORMAL settings the app uses with SQLite's
+default rollback journal (journal_mode=DELETE, synchronous=FULL). Reader
+threads page through expenses with get_expenses_page while writer threads
+add expenses with add_expense, and the report shows operations per second,
+latency percentiles and errors for each side. Each mode runs in its own
+process on a temporary database, because the engine is configured from the
+environment at import time.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import date, timedelta
+
+import numpy as np
+
+# Journal mode and synchronous setting per benchmarked configuration
+MODES = {
+    "wal": ("WAL", "NORMAL"),
+    "delete": ("DELETE", "FULL")
+}
+BENCHMARK_USER_ID = "benchmark_user"
+
+def seed_expenses(count):
+    """Expense dicts spread over the last two years."""
+    merchants = [
+        ("Grocery store", "Food", 85.40), ("Gas station", "Transportation", 42.10), ("Streaming service", "Entertainment", 15.49),
+        ("Rent payment", "Housing", 1500.00), ("Pharmacy", "Health", 23.99), ("Electric company", "Utilities", 98.00)
+    ]
+    today = date.today()
+    return [
+        {
+            "description": merchants[index % len(merchants)][0],
+            "amount": merchants[index % len(merchants)][2] + index % 7,
+            "date": str(today - timedelta(days=index * 730 // count)),
+            "category": merchants[index % len(merchants)][1]
+        }
+        for index in range(count)
+    ]
+
+def run_mode(readers, writers, duration, seed_rows):
+    """Run readers and writers for duration seconds in this process and return their timings."""
+    from utils import database
+    database.init_db()
+    database.bulk_insert_expenses(seed_expenses(seed_rows), user_id=BENCHMARK_USER_ID)
+    with database.engine.connect() as connection:
+        journal_mode = connection.exec_driver_sql("PRAGMA journal_mode").scalar()
+    
+    latencies = {"read": [], "write": []}
+    errors = {"read": 0, "write": 0}
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+    
+    def read():
+        start = date.today() - timedelta(days=90)
+        database.get_expenses_page({"start_date": start}, limit=50, user_id=BENCHMARK_USER_ID)
+    
+    def write():
+        database.add_expense(
+            {"description": "Benchmark purchase", "amount": 12.5, "date": str(date.today()), "category": "Food"},
+            user_id=BENCHMARK_USER_ID
+        )
+    
+    def worker(kind, operation):
+        timings = []
+        failed = 0
+        while time.perf_counter() < stop_at:
+            started = time.perf_counter()
+            try:
+                operation()
+            except Exception:
+                # e.g. "database is locked" once busy_timeout runs out
+                failed += 1
+                continue
+            timings.append(time.perf_counter() - started)
+        with lock:
+            latencies[kind].extend(timings)
+            errors[kind] += failed
+    
+    threads = [threading.Thread(target=worker, args=("read", read)) for _ in range(readers)]
+    threads += [threading.Thread(target=worker, args=("write", write)) for _ in range(writers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    
+    result = {"journal_mode": journal_mode}
+    for kind, timings in latencies.items():
+        timings = np.array(timings) if timings else np.zeros(1)
+        result[kind] = {
+            "operations": len(latencies[kind]),
+            "throughput": len(latencies[kind]) / duration,
+            "p50": float(np.percentile(timings, 50)),
+            "p95": float(np.percentile(timings, 95)),
+            "max": float(timings.max()),
+            "errors": errors[kind]
+        }
+    return result
+
+def run_mode_process(mode, args):
+    """Run one mode in a fresh interpreter with the matching environment and return its result."""
+    journal_mode, synchronous = MODES[mode]
+    with tempfile.TemporaryDirectory() as workdir:
+        environment = dict(
+            os.environ,
+            FINANCE_DB_PATH=os.path.join(workdir, "benchmark.db"),
+            FINANCE_DB_JOURNAL_MODE=journal_mode,
+            FINANCE_DB_SYNCHRONOUS=synchronous
+        )
+        command = [
+            sys.executable, os.path.abspath(__file__), "--worker",
+            "--readers", str(args.readers), "--writers", str(args.writers),
+            "--duration", str(args.duration), "--seed-rows", str(args.seed_rows)
+        ]
+        output = subprocess.run(command, env=environment, check=True, capture_output=True, text=True).stdout
+    return dict(json.loads(output.strip().splitlines()[-1]), mode=mode)
+
+def print_report(results):
+    print(f"{'mode':<10}{'side':<7}{'ops/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'max ms':>9}{'errors':>8}")
+    for result in results:
+        for kind in ["read", "write"]:
+            stats = result[kind]
+            print(
+                f"{result['mode']:<10}{kind:<7}{stats['throughput']:>9.1f}"
+                f"{stats['p50'] * 1000:>9.1f}{stats['p95'] * 1000:>9.1f}{stats['max'] * 1000:>9.1f}{stats['errors']:>8}"
+            )
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare concurrent SQLite reader/writer throughput across journal modes.")
+    parser.add_argument("--modes", nargs="+", choices=sorted(MODES), default=["wal", "delete"])
+    parser.add_argument("--readers", type=int, default=4, help="reader threads")
+    parser.add_argument("--writers", type=int, default=1, help="writer threads")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds to run each mode")
+    parser.add_argument("--seed-rows", type=int, default=20000, help="expenses in the database before the run")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.worker:
+        print(json.dumps(run_mode(args.readers, args.writers, args.duration, args.seed_rows)))
+        sys.exit(0)
+    
+    results = [run_mode_process(mode, args) for mode in args.modes]
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_report(results)
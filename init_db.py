@@ -1,6 +1,23 @@
-from utils.database import init_db
+import argparse
+
+from utils.database import init_db, rebuild_monthly_rollup, verify_monthly_rollup
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Initialize the Finance Assistant database.")
+    parser.add_argument("--verify-rollup", action="store_true", help="check the monthly category rollup against the raw expenses")
+    parser.add_argument("--rebuild-rollup", action="store_true", help="recompute the monthly category rollup from the raw expenses")
+    args = parser.parse_args()
+    
     print("Initializing database...")
     init_db()
-    print("Database initialized successfully!")
\ No newline at end of file
+    print("Database initialized successfully!")
+    
+    if args.verify_rollup:
+        mismatches = verify_monthly_rollup()
+        for user_id, month, category, stored, expected in mismatches:
+            print(f"Rollup mismatch for {user_id} {month} {category}: stored {stored}, expected {expected}")
+        print(f"Monthly rollup verified: {len(mismatches)} mismatched rows")
+    
+    if args.rebuild_rollup:
+        rebuild_monthly_rollup()
+        print("Monthly rollup rebuilt successfully!")
@@ -0,0 +1,46 @@
+"""
+Shared test setup.
+
+The database engine and AI client are configured from the environment when
+utils is first imported, so point them at a temporary database and no API key
+before any test module imports the app code.
+"""
+import os
+import sys
+import tempfile
+from datetime import date, timedelta
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+_workdir = tempfile.TemporaryDirectory()
+os.environ["FINANCE_DB_PATH"] = os.path.join(_workdir.name, "test.db")
+os.environ.pop("OPENAI_API_KEY", None)
+
+@pytest.fixture
+def sample_expenses():
+    """Build count expenses shaped like get_all_expenses() results, spread over the last year."""
+    merchants = [
+        ("Grocery store", "Food", 8540), ("Coffee shop", "Food", 475), ("Gas station", "Transportation", 4210),
+        ("Streaming service", "Entertainment", 1549), ("Rent payment", "Housing", 150000), ("Pharmacy", "Health", 2399)
+    ]
+    
+    def build(count):
+        today = date.today()
+        expenses = []
+        for index in range(count):
+            description, category, cents = merchants[index % len(merchants)]
+            amount_cents = cents + index % 7 * 13
+            expenses.append({
+                "id": index + 1,
+                "description": description,
+                "amount": amount_cents / 100,
+                "amount_cents": amount_cents,
+                "date": str(today - timedelta(days=index * 365 // max(count, 1))),
+                "category": category
+            })
+        return expenses
+    
+    return build
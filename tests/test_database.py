@@ -0,0 +1,31 @@
+"""Engine sharing and categorization cache behaviour of utils.database."""
+from utils.database import (
+    DATABASE_PATH, Session, engine, get_engine, get_session_factory, init_db, get_cached_category, save_cached_category
+)
+
+def test_session_factory_is_bound_to_the_module_engine():
+    assert Session.kw["bind"] is engine
+
+def test_engine_is_cached_per_path():
+    assert get_engine() is get_engine(DATABASE_PATH) is engine
+    assert get_session_factory() is get_session_factory(DATABASE_PATH) is Session
+
+def _cache_entry(description_key):
+    with engine.connect() as connection:
+        return connection.exec_driver_sql(
+            "SELECT last_used_at, hit_count FROM category_cache WHERE description_key = ?", (description_key,)
+        ).one()
+
+def test_cache_hits_only_write_when_the_entry_was_not_used_recently():
+    init_db()
+    save_cached_category("corner bakery", "Food")
+    saved = _cache_entry("corner bakery")
+    
+    for _ in range(3):
+        assert get_cached_category("corner bakery") == "Food"
+    assert _cache_entry("corner bakery") == saved
+    
+    assert get_cached_category("corner bakery", touch_interval=0) == "Food"
+    last_used_at, hit_count = _cache_entry("corner bakery")
+    assert last_used_at > saved[0] and hit_count == 1
+    assert get_cached_category("unknown merchant") is None
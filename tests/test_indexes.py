@@ -0,0 +1,28 @@
+"""The expense list and report queries are answered from the composite expense indexes."""
+from datetime import date
+
+from sqlalchemy import select
+
+from utils.database import DEFAULT_USER_ID, Expense, engine, init_db, _apply_expense_filters
+
+def _query_plan(filters):
+    """EXPLAIN QUERY PLAN details of the app's filtered expense query."""
+    table = Expense.__table__
+    statement = select(table.c.id, table.c.amount_cents).where(table.c.user_id == DEFAULT_USER_ID)
+    statement = _apply_expense_filters(statement, filters).order_by(table.c.date, table.c.id)
+    sql = str(statement.compile(engine, compile_kwargs={"literal_binds": True}))
+    with engine.connect() as connection:
+        return " ".join(row[-1] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}"))
+
+def setup_module():
+    init_db()
+
+def test_date_range_query_uses_user_date_index():
+    plan = _query_plan({"start_date": date(2024, 1, 1), "end_date": date(2024, 3, 31)})
+    assert "ix_expenses_user_date" in plan
+    assert "SCAN expenses" not in plan
+
+def test_category_date_query_uses_user_category_date_index():
+    plan = _query_plan({"start_date": date(2024, 1, 1), "end_date": date(2024, 3, 31), "category": "Food"})
+    assert "ix_expenses_user_category_date" in plan
+    assert "SCAN expenses" not in plan
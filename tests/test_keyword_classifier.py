@@ -0,0 +1,32 @@
+"""KeywordClassifier gives the same answers as checking each keyword as a substring, in table order."""
+import pytest
+
+from utils.openai_utils import KEYWORD_CATEGORIES, KeywordClassifier, keyword_category
+
+def substring_category(description):
+    description = description.lower()
+    for category, keywords in KEYWORD_CATEGORIES:
+        if any(keyword in description for keyword in keywords):
+            return category
+    return "Other"
+
+@pytest.mark.parametrize("description, category", [
+    # "gas" starts inside "saving", and "rent" inside "carent"
+    ("universitysavingas", "Transportation"),
+    ("savingasgame", "Transportation"),
+    ("carent", "Housing"),
+    ("Gas bill for March", "Housing"),
+    ("Gas station", "Transportation"),
+    ("Coffee", "Other"),
+    ("", "Other")
+])
+def test_overlapping_and_contained_keywords(description, category):
+    assert keyword_category(description) == category
+    assert substring_category(description) == category
+
+def test_matches_substring_chain_on_run_together_keywords():
+    keywords = [keyword for _, category_keywords in KEYWORD_CATEGORIES for keyword in category_keywords]
+    descriptions = [first + second + third for first in keywords for second in keywords for third in ["", "s", "as"]]
+    classifier = KeywordClassifier(KEYWORD_CATEGORIES)
+    
+    assert classifier.classify_many(descriptions) == [substring_category(text) for text in descriptions]
@@ -0,0 +1,236 @@
+"""ResilientCaller retries, deadlines and circuit breaking against the local stub server."""
+import time
+
+import openai
+import pytest
+
+from ai_stub_server import StubServer
+from utils.llm_client import CircuitBreaker, CircuitOpenError, ResilientCaller
+
+@pytest.fixture
+def stub():
+    servers = []
+    
+    def start(**options):
+        server = StubServer(**options).start()
+        servers.append(server)
+        return server
+    
+    yield start
+    for server in servers:
+        server.stop()
+
+def _request(server, on_attempt=None):
+    """A request(timeout) callable sending one categorization to the stub."""
+    client = openai.OpenAI(base_url=server.base_url, api_key="stub-key", max_retries=0)
+    
+    def request(timeout):
+        try:
+            return client.chat.completions.create(
+                model="gpt-4o",
+                messages=[{"role": "system", "content": "You are a helpful assistant that categorizes expenses."}],
+                timeout=timeout
+            )
+        finally:
+            if on_attempt:
+                on_attempt()
+    
+    return request
+
+def _caller(**options):
+    options.setdefault("backoff_base", 0.01)
+    options.setdefault("backoff_cap", 0.02)
+    return ResilientCaller(**options)
+
+def _requests_sent(server):
+    return sum(kind_stats["requests"] for kind_stats in server.stats.values())
+
+@pytest.mark.parametrize("status", [500, 503, 429])
+def test_retries_server_errors_and_rate_limits(stub, status):
+    server = stub(error_rate=1.0, error_status=status)
+    
+    def recover():
+        server.error_rate = 0.0
+    
+    caller = _caller()
+    response = caller.call("categorize", _request(server, on_attempt=recover))
+    
+    assert response.choices[0].message.content == "Food"
+    assert _requests_sent(server) == 2
+    stats = caller.get_stats()["endpoints"]["categorize"]
+    assert (stats["calls"], stats["successes"], stats["retries"]) == (1, 1, 1)
+
+def test_gives_up_after_max_retries(stub):
+    server = stub(error_rate=1.0, error_status=500)
+    caller = _caller(max_retries=2)
+    
+    with pytest.raises(openai.InternalServerError):
+        caller.call("categorize", _request(server))
+    
+    assert _requests_sent(server) == 3
+    stats = caller.get_stats()["endpoints"]["categorize"]
+    assert (stats["failures"], stats["retries"]) == (1, 2)
+
+def test_attempt_timeout_cuts_off_slow_response(stub):
+    server = stub(latency=1.0)
+    caller = _caller(attempt_timeout=0.1, max_retries=0)
+    
+    started = time.monotonic()
+    with pytest.raises(openai.APITimeoutError):
+        caller.call("categorize", _request(server))
+    
+    assert time.monotonic() - started < 0.5
+    assert caller.get_stats()["endpoints"]["categorize"]["timeouts"] == 1
+
+def test_deadline_bounds_all_retries(stub):
+    server = stub(latency=1.0)
+    caller = _caller(attempt_timeout=5.0, max_retries=10)
+    
+    started = time.monotonic()
+    with pytest.raises(openai.APITimeoutError):
+        caller.call("categorize", _request(server), deadline=0.3)
+    
+    # Each attempt's timeout is cut to the time left, so the call ends near the deadline
+    assert time.monotonic() - started < 0.8
+    stats = caller.get_stats()["endpoints"]["categorize"]
+    assert stats["timeouts"] == stats["retries"] + 1
+
+def test_circuit_opens_short_circuits_and_closes_after_trial(stub):
+    server = stub(error_rate=1.0, error_status=500)
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=0.2)
+    caller = _caller(breaker=breaker, max_retries=0)
+    request = _request(server)
+    
+    for _ in range(2):
+        with pytest.raises(openai.InternalServerError):
+            caller.call("categorize", request)
+    assert breaker.state == "open"
+    
+    with pytest.raises(CircuitOpenError):
+        caller.call("categorize", request)
+    assert _requests_sent(server) == 2
+    assert caller.get_stats()["endpoints"]["categorize"]["short_circuited"] == 1
+    
+    time.sleep(0.25)
+    assert breaker.state == "half-open"
+    server.error_rate = 0.0
+    caller.call("categorize", request)
+    assert breaker.state == "closed"
+
+def test_failed_half_open_trial_reopens_circuit(stub):
+    server = stub(error_rate=1.0, error_status=500)
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=0.2)
+    caller = _caller(breaker=breaker, max_retries=0)
+    request = _request(server)
+    
+    with pytest.raises(openai.InternalServerError):
+        caller.call("categorize", request)
+    time.sleep(0.25)
+    with pytest.raises(openai.InternalServerError):
+        caller.call("categorize", request)
+    
+    assert breaker.state == "open"
+
+def test_client_errors_are_not_retried_and_keep_circuit_closed(stub):
+    server = stub(error_rate=1.0, error_status=400)
+    breaker = CircuitBreaker(failure_threshold=2, cooldown=60)
+    caller = _caller(breaker=breaker)
+    request = _request(server)
+    
+    for _ in range(3):
+        with pytest.raises(openai.BadRequestError):
+            caller.call("categorize", request)
+    
+    assert _requests_sent(server) == 3
+    assert breaker.state == "closed"
+    stats = caller.get_stats()["endpoints"]["categorize"]
+    assert (stats["failures"], stats["retries"], stats["short_circuited"]) == (3, 0, 0)
+
+def _broken_stream(items):
+    """A request(timeout) callable whose stream yields items, then loses the connection."""
+    def request(timeout):
+        def stream():
+            yield from items
+            raise openai.APIConnectionError(request=None)
+        return stream()
+    return request
+
+def test_stream_records_success_when_it_ends():
+    caller = _caller()
+    
+    assert list(caller.stream("spending_insights", lambda timeout: iter(["a", "b"]))) == ["a", "b"]
+    stats = caller.get_stats()["endpoints"]["spending_insights"]
+    assert (stats["calls"], stats["successes"], stats["failures"]) == (1, 1, 0)
+
+def test_stream_failure_partway_counts_against_circuit():
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=60)
+    caller = _caller(breaker=breaker)
+    received = []
+    
+    with pytest.raises(openai.APIConnectionError):
+        for item in caller.stream("spending_insights", _broken_stream(["a", "b"])):
+            received.append(item)
+    
+    assert received == ["a", "b"]
+    assert breaker.state == "open"
+    stats = caller.get_stats()["endpoints"]["spending_insights"]
+    assert (stats["calls"], stats["successes"], stats["failures"]) == (1, 0, 1)
+
+def test_stream_stopped_early_by_consumer_is_not_a_failure():
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=60)
+    caller = _caller(breaker=breaker)
+    
+    stream = caller.stream("spending_insights", _broken_stream(["a", "b"]))
+    assert next(stream) == "a"
+    stream.close()
+    
+    assert breaker.state == "closed"
+    assert caller.get_stats()["endpoints"]["spending_insights"]["successes"] == 1
+
+def test_local_error_in_half_open_trial_leaves_circuit_open(stub):
+    server = stub(error_rate=1.0, error_status=500)
+    breaker = CircuitBreaker(failure_threshold=1, cooldown=0.2)
+    caller = _caller(breaker=breaker, max_retries=0)
+    
+    with pytest.raises(openai.InternalServerError):
+        caller.call("categorize", _request(server))
+    time.sleep(0.25)
+    server.error_rate = 0.0
+    
+    def buggy_request(timeout):
+        # The API answers, then the caller's own parsing fails
+        return _request(server)(timeout).choices[0].message.missing_field
+    
+    with pytest.raises(AttributeError):
+        caller.call("categorize", buggy_request)
+    
+    assert breaker.state == "half-open"
+    assert breaker.failures == 1
+    # The trial slot was released, so the next call may try again
+    caller.call("categorize", _request(server))
+    assert breaker.state == "closed"
+
+def test_stream_deadline_cuts_off_slow_token_stream(stub):
+    server = stub(chunk_delay=0.2)
+    client = openai.OpenAI(base_url=server.base_url, api_key="stub-key", max_retries=0)
+    caller = _caller(attempt_timeout=5.0)
+    
+    def request(timeout):
+        return client.chat.completions.create(
+            model="gpt-4o",
+            messages=[{"role": "system", "content": "You are a financial assistant analyzing spending patterns."}],
+            stream=True,
+            timeout=timeout
+        )
+    
+    received = []
+    started = time.monotonic()
+    with pytest.raises(openai.APITimeoutError):
+        for chunk in caller.stream("spending_insights", request, deadline=0.5):
+            received.append(chunk)
+    
+    # Each chunk arrives well within the read timeout; only the overall deadline stops the stream
+    assert time.monotonic() - started < 1.0
+    assert received
+    stats = caller.get_stats()["endpoints"]["spending_insights"]
+    assert (stats["failures"], stats["timeouts"]) == (1, 1)
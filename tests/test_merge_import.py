@@ -0,0 +1,45 @@
+"""Merging imports matches expenses on date, description and amount, with category updatable."""
+import io
+
+import pytest
+
+from utils.database import init_db, get_all_expenses, get_monthly_category_totals, merge_import
+from utils.import_utils import fill_missing_categories, iter_csv_records
+
+CSV = """date,description,amount,category
+2024-03-01,Corner bakery,4.50,
+2024-03-01,Corner bakery,4.50,
+2024-03-02,City parking,12.00,
+"""
+
+@pytest.fixture
+def user_id(request):
+    init_db()
+    return f"merge_{request.node.name}"
+
+def _merge(text, user_id, guess="Food"):
+    records = fill_missing_categories(iter_csv_records(io.StringIO(text)), lambda expenses: [guess] * len(expenses))
+    return merge_import(records, user_id)
+
+def test_reimporting_uncategorized_file_with_different_guesses_adds_no_duplicates(user_id):
+    assert _merge(CSV, user_id, guess="Food") == {"inserted": 3, "updated": 0, "skipped": 0}
+    assert _merge(CSV, user_id, guess="Shopping") == {"inserted": 0, "updated": 0, "skipped": 3}
+    
+    expenses = get_all_expenses(user_id)
+    assert len(expenses) == 3
+    assert {expense["category"] for expense in expenses} == {"Food"}
+
+def test_explicit_category_updates_the_matching_expense(user_id):
+    _merge(CSV, user_id, guess="Food")
+    recategorized = "date,description,amount,category\n2024-03-02,City parking,12.00,Transportation\n"
+    
+    assert _merge(recategorized, user_id) == {"inserted": 0, "updated": 1, "skipped": 0}
+    assert sorted(expense["category"] for expense in get_all_expenses(user_id)) == ["Food", "Food", "Transportation"]
+    assert get_monthly_category_totals(user_id=user_id) == {"2024-03": {"Food": 9.0, "Transportation": 12.0}}
+
+def test_repeated_rows_are_matched_by_occurrence(user_id):
+    _merge(CSV, user_id)
+    three_bakery_visits = CSV + "2024-03-01,Corner bakery,4.50,\n"
+    
+    assert _merge(three_bakery_visits, user_id) == {"inserted": 1, "updated": 0, "skipped": 3}
+    assert len(get_all_expenses(user_id)) == 4
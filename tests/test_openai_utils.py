@@ -0,0 +1,48 @@
+"""Streamed insights that break off partway are reported as failures and never stored."""
+from types import SimpleNamespace
+
+import openai
+import pytest
+
+from utils import openai_utils
+from utils.database import engine, init_db
+from utils.llm_client import CircuitBreaker, ResilientCaller
+
+USER_ID = "stream_test_user"
+
+def _chunk(text):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=text))])
+
+@pytest.fixture
+def broken_stream(monkeypatch):
+    """Make the insights request stream two insights, then lose the connection."""
+    init_db()
+    caller = ResilientCaller(CircuitBreaker(failure_threshold=1, cooldown=60), max_retries=0)
+    
+    def request(timeout, **options):
+        yield _chunk('{"insight": "Food is your largest category."}\n')
+        yield _chunk('{"insight": "Subscriptions add up."}\n{"ins')
+        raise openai.APIConnectionError(request=None)
+    
+    monkeypatch.setattr(openai_utils, "client", SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=request))))
+    monkeypatch.setattr(openai_utils, "llm_caller", caller)
+    return caller
+
+def test_broken_stream_raises_after_partial_insights_and_stores_nothing(broken_stream, sample_expenses):
+    received = []
+    with pytest.raises(openai_utils.InsightStreamError) as raised:
+        for insight in openai_utils.stream_spending_insights(sample_expenses(30), USER_ID, force=True):
+            received.append(insight)
+    
+    assert received == ["Food is your largest category.", "Subscriptions add up."]
+    assert raised.value.insights == received
+    with engine.connect() as connection:
+        stored = connection.exec_driver_sql("SELECT COUNT(*) FROM llm_results WHERE user_id = ?", (USER_ID,)).scalar()
+    assert stored == 0
+    assert broken_stream.breaker.state == "open"
+    assert broken_stream.get_stats()["endpoints"]["spending_insights"]["failures"] == 1
+
+def test_analyze_falls_back_to_complete_basic_insights(broken_stream, sample_expenses):
+    expenses = sample_expenses(30)
+    
+    assert openai_utils.analyze_spending_patterns(expenses, USER_ID, force=True) == openai_utils._basic_insights(expenses)
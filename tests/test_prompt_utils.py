@@ -0,0 +1,47 @@
+"""The AI prompt summary stays within its token budget however long the history is."""
+import random
+from datetime import date, timedelta
+
+import pytest
+
+from utils.prompt_utils import PROMPT_TOKEN_BUDGET, build_spending_summary, estimate_tokens
+
+MERCHANTS = [
+    ("Grocery store", "Food", 8540), ("Coffee shop", "Food", 475), ("Gas station", "Transportation", 4210),
+    ("Streaming service", "Entertainment", 1549), ("Rent payment", "Housing", 150000), ("Pharmacy", "Health", 2399),
+    ("Electric company", "Utilities", 9800), ("Bookstore", "Education", 3100), ("Airline tickets", "Travel", 42000),
+    ("Gym membership", "Health", 4500), ("Restaurant", "Food", 5600), ("Hardware store", "Shopping", 2750)
+]
+
+def synthetic_expenses(count, seed=0):
+    """Expenses shaped like get_all_expenses() results over two years, with some noise and outliers."""
+    rng = random.Random(seed)
+    end = date(2024, 12, 31)
+    expenses = []
+    for index in range(count):
+        description, category, cents = MERCHANTS[rng.randrange(len(MERCHANTS))]
+        amount_cents = int(cents * rng.uniform(0.8, 1.2)) * (10 if rng.random() < 0.001 else 1)
+        expenses.append({
+            "id": index + 1,
+            "description": f"{description} #{rng.randrange(100)}",
+            "amount": amount_cents / 100,
+            "amount_cents": amount_cents,
+            "date": str(end - timedelta(days=index * 730 // count)),
+            "category": category
+        })
+    return expenses
+
+@pytest.mark.parametrize("token_budget", [PROMPT_TOKEN_BUDGET, 400])
+def test_summary_fits_budget_and_stays_flat(token_budget):
+    sizes = {}
+    for count in [50, 500, 5000, 50000]:
+        summary = build_spending_summary(synthetic_expenses(count), token_budget=token_budget)
+        assert summary
+        assert estimate_tokens(summary) <= token_budget
+        sizes[count] = estimate_tokens(summary)
+    
+    # Once every section is filled, ten times more rows barely lengthen the summary
+    assert sizes[50000] <= sizes[5000] * 1.25
+
+def test_empty_history_gives_empty_summary():
+    assert build_spending_summary([]) == ""
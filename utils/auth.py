@@ -3,6 +3,8 @@ import streamlit as st
 import extra_streamlit_components as stx
 from datetime import datetime, timedelta
 
+from utils.database import DEFAULT_USER_ID
+
 # Clerk keys - these would be set up in your environment variables
 # when deployed or in .env file locally
 CLERK_PUBLISHABLE_KEY = os.environ.get("CLERK_PUBLISHABLE_KEY")
@@ -22,6 +24,13 @@ def initialize_auth():
     if "user_name" not in st.session_state:
         st.session_state.user_name = None
 
+def get_current_user_id():
+    """
+    Get the ID that owns the current session's data.
+    Before anyone signs in this is the default (demo) user.
+    """
+    return st.session_state.get("user_id") or DEFAULT_USER_ID
+
 def clerk_auth():
     """
     Handle Clerk authentication using a cookie manager.
@@ -0,0 +1,163 @@
+"""Local expense categorizer trained on each user's own categorized expenses."""
+
+import os
+import re
+import zlib
+import threading
+from collections import OrderedDict
+import numpy as np
+
+from utils.database import DEFAULT_USER_ID, get_expense_labels, get_expense_version, get_expense_reset_count
+from utils.data_utils import EXPENSE_CATEGORIES
+
+# Size of the hashed feature space; collisions are rare at this size for short descriptions
+HASHED_FEATURES = 2 ** 16
+# Additive smoothing for the per-category feature counts
+SMOOTHING = 0.1
+# Predictions below this probability are left to the AI categorizer
+MIN_CONFIDENCE = float(os.environ.get("FINANCE_LOCAL_CLASSIFIER_MIN_CONFIDENCE", "0.9"))
+# The model makes no predictions until it has seen this many expenses
+MIN_TRAINING_EXAMPLES = int(os.environ.get("FINANCE_LOCAL_CLASSIFIER_MIN_EXAMPLES", "30"))
+# Number of users whose models are kept in memory
+CATEGORIZER_CACHE_SIZE = 32
+
+def description_features(description):
+    """
+    Hash a description into (word_features, trigram_features) index arrays.
+    Digits and punctuation are dropped, and the character trigrams of each
+    space-padded word tolerate small spelling differences.
+    """
+    words = re.sub(r"[^a-z]+", " ", (description or "").lower()).split()
+    word_features = [zlib.crc32(word.encode()) % HASHED_FEATURES for word in words]
+    trigram_features = []
+    for word in words:
+        padded = f" {word} "
+        for start in range(len(padded) - 2):
+            trigram_features.append(zlib.crc32(b"#" + padded[start:start + 3].encode()) % HASHED_FEATURES)
+    return np.array(word_features, dtype=np.int64), np.array(trigram_features, dtype=np.int64)
+
+class NaiveBayesCategorizer:
+    """
+    Multinomial Naive Bayes over hashed description features.
+    
+    Training only adds to per-category counts, so the model is updated
+    incrementally as expenses are added, and a prediction is a handful of
+    array lookups.
+    """
+    
+    def __init__(self, categories=EXPENSE_CATEGORIES):
+        self.categories = list(categories)
+        self._category_index = {category: index for index, category in enumerate(self.categories)}
+        self.feature_counts = np.zeros((len(self.categories), HASHED_FEATURES), dtype=np.float32)
+        self.category_counts = np.zeros(len(self.categories), dtype=np.float64)
+        self._log_likelihoods = None
+    
+    @property
+    def example_count(self):
+        return int(self.category_counts.sum())
+    
+    def _add_category(self, category):
+        self._category_index[category] = len(self.categories)
+        self.categories.append(category)
+        self.feature_counts = np.vstack([self.feature_counts, np.zeros((1, HASHED_FEATURES), dtype=np.float32)])
+        self.category_counts = np.append(self.category_counts, 0)
+    
+    def partial_fit(self, descriptions, categories):
+        """Add labeled examples to the model."""
+        for description, category in zip(descriptions, categories):
+            if category not in self._category_index:
+                self._add_category(category)
+            index = self._category_index[category]
+            np.add.at(self.feature_counts[index], np.concatenate(description_features(description)), 1)
+            self.category_counts[index] += 1
+        # Recompute the log tables lazily on the next prediction
+        self._log_likelihoods = None
+    
+    def _refresh_tables(self):
+        smoothed = self.feature_counts + SMOOTHING
+        self._log_likelihoods = np.log(smoothed) - np.log(smoothed.sum(axis=1, keepdims=True))
+        # Categories never seen get no prior weight
+        with np.errstate(divide="ignore"):
+            self._log_priors = np.log(self.category_counts / max(self.category_counts.sum(), 1))
+    
+    def predict(self, description):
+        """Get (category, probability) for a description, or (None, 0.0) if the model cannot tell."""
+        if self.example_count < MIN_TRAINING_EXAMPLES:
+            return None, 0.0
+        word_features, trigram_features = description_features(description)
+        # Trigrams alone are shared by too many unrelated words to be trusted,
+        # so only descriptions with a word seen in training are predicted
+        if not len(word_features) or not self.feature_counts[:, word_features].any():
+            return None, 0.0
+        if self._log_likelihoods is None:
+            self._refresh_tables()
+        
+        # Features never seen in training carry no evidence, only a bias towards
+        # rarely seen categories, so they are left out
+        features = np.concatenate([word_features, trigram_features])
+        features = features[self.feature_counts[:, features].any(axis=0)]
+        
+        scores = self._log_priors + self._log_likelihoods[:, features].sum(axis=1)
+        best = int(np.argmax(scores))
+        # Softmax probability of the best category
+        probability = 1.0 / np.exp(scores - scores[best]).sum()
+        return self.categories[best], float(probability)
+
+class UserCategorizer:
+    """
+    A user's categorizer, trained incrementally from their stored expenses.
+    Only new expense ids are read on refresh. When expenses are deleted or
+    replaced, ids can be reused, so the model is retrained from scratch.
+    """
+    
+    def __init__(self, user_id):
+        self.user_id = user_id
+        self.model = NaiveBayesCategorizer()
+        self.last_expense_id = 0
+        self.dataset_version = None
+        self.reset_count = 0
+        self.lock = threading.Lock()
+    
+    def refresh(self):
+        """Train on expenses stored since the last refresh."""
+        version = get_expense_version(self.user_id)
+        if version == self.dataset_version:
+            return
+        reset_count = get_expense_reset_count(self.user_id)
+        if reset_count != self.reset_count:
+            self.model = NaiveBayesCategorizer()
+            self.last_expense_id = 0
+            self.reset_count = reset_count
+        labels = get_expense_labels(self.last_expense_id, self.user_id)
+        if labels:
+            _, descriptions, categories = zip(*labels)
+            self.model.partial_fit(descriptions, categories)
+            self.last_expense_id = labels[-1][0]
+        self.dataset_version = version
+    
+    def predict(self, description):
+        """Get (category, probability) for a description after catching up on new expenses."""
+        with self.lock:
+            self.refresh()
+            return self.model.predict(description)
+
+_categorizers = OrderedDict()
+_categorizers_lock = threading.Lock()
+
+def get_user_categorizer(user_id=DEFAULT_USER_ID):
+    """Get the shared local categorizer for a user."""
+    with _categorizers_lock:
+        if user_id not in _categorizers:
+            _categorizers[user_id] = UserCategorizer(user_id)
+            while len(_categorizers) > CATEGORIZER_CACHE_SIZE:
+                _categorizers.popitem(last=False)
+        _categorizers.move_to_end(user_id)
+        return _categorizers[user_id]
+
+def predict_category(description, user_id=DEFAULT_USER_ID, min_confidence=MIN_CONFIDENCE):
+    """
+    Categorize a description with the user's local model.
+    Returns the category, or None when the model is not confident enough.
+    """
+    category, probability = get_user_categorizer(user_id).predict(description)
+    return category if probability >= min_confidence else None
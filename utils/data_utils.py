@@ -1,7 +1,275 @@
+import threading
+from collections import OrderedDict
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
 import calendar
 
+from utils.database import DEFAULT_USER_ID, WEEK_START, to_cents, from_cents, get_expense_version, get_expense_columns, get_expense_totals_by_category, get_expense_totals_by_period, get_monthly_category_totals
+
+# The fixed expense categories offered by the app. The analytics layer
+# carries categories as small integer codes into this list, with any custom
+# categories found in the data appended after it
+EXPENSE_CATEGORIES = [
+    "Housing", "Transportation", "Food", "Entertainment",
+    "Shopping", "Health", "Education", "Travel",
+    "Savings/Investment", "Other"
+]
+
+# Parsed expense stores shared by every helper and chart, keyed
+# by (kind, user_id) and tagged with the dataset version they were built from
+EXPENSE_CACHE_SIZE = 64
+_expense_cache = OrderedDict()
+_expense_cache_lock = threading.Lock()
+
+def get_category_list(values=()):
+    """
+    Get the category dictionary for a set of category values: the fixed
+    categories followed by any others found in values, sorted.
+    """
+    known = set(EXPENSE_CATEGORIES)
+    extras = sorted(category for category in pd.unique(np.asarray(values, dtype=object)) if category not in known)
+    return EXPENSE_CATEGORIES + extras
+
+def encode_categories(values):
+    """
+    Encode category strings as int16 codes into get_category_list(values).
+    Returns (codes, categories).
+    """
+    categorical = pd.Categorical(values, categories=get_category_list(values))
+    return categorical.codes.astype(np.int16), np.array(categorical.categories, dtype=object)
+
+class ExpenseAggregates:
+    """
+    Running expense totals by category, month and day, kept in session state
+    next to the expense list. Adding or removing an expense updates them in
+    O(1), so pages read totals instead of re-summing the whole list.
+    Amounts are tracked in integer cents.
+    """
+    
+    def __init__(self, expenses=()):
+        self.total_cents = 0
+        self.count = 0
+        # Each bucket maps a key to [total_cents, expense_count]; the count
+        # lets a key be dropped once its last expense is removed
+        self.by_category = {}
+        self.by_month = {}
+        self.by_day = {}
+        self.by_month_category = {}
+        for expense in expenses:
+            self.add(expense)
+    
+    @staticmethod
+    def _adjust(bucket, key, cents, count):
+        totals = bucket.setdefault(key, [0, 0])
+        totals[0] += cents
+        totals[1] += count
+        if totals[1] <= 0:
+            del bucket[key]
+    
+    def _apply(self, expense, sign):
+        cents = expense["amount_cents"] if "amount_cents" in expense else to_cents(expense["amount"])
+        cents *= sign
+        day = str(expense["date"])[:10]
+        month = day[:7]
+        category = expense["category"]
+        self.total_cents += cents
+        self.count += sign
+        self._adjust(self.by_category, category, cents, sign)
+        self._adjust(self.by_month, month, cents, sign)
+        self._adjust(self.by_day, day, cents, sign)
+        self._adjust(self.by_month_category, (month, category), cents, sign)
+    
+    def add(self, expense):
+        """Count a newly added expense dict."""
+        self._apply(expense, 1)
+    
+    def remove(self, expense):
+        """Stop counting a deleted expense dict."""
+        self._apply(expense, -1)
+    
+    @property
+    def total(self):
+        """Total of all expenses in dollars."""
+        return from_cents(self.total_cents)
+    
+    def get_month_total(self, month):
+        """Total in dollars for a "YYYY-MM" month."""
+        return from_cents(self.by_month.get(month, (0, 0))[0])
+    
+    def get_category_totals(self, month=None):
+        """Totals in dollars by category, for all time or for one "YYYY-MM" month."""
+        if month is None:
+            return {category: from_cents(totals[0]) for category, totals in self.by_category.items()}
+        return {
+            category: from_cents(totals[0])
+            for (key_month, category), totals in self.by_month_category.items()
+            if key_month == month
+        }
+    
+    def get_month_totals(self):
+        """Totals in dollars by "YYYY-MM" month, in month order."""
+        return {month: from_cents(self.by_month[month][0]) for month in sorted(self.by_month)}
+    
+    def get_day_totals(self):
+        """Totals in dollars by "YYYY-MM-DD" day, in date order."""
+        return {day: from_cents(self.by_day[day][0]) for day in sorted(self.by_day)}
+
+def _day_ordinal(value):
+    """Convert a date, datetime or ISO date string to days since 1970-01-01."""
+    return int(np.datetime64(pd.Timestamp(value).date(), "D").astype(np.int64))
+
+class ExpenseStore:
+    """
+    Compact columnar copy of expenses, sorted by date.
+    
+    Dates are int32 day ordinals (days since 1970-01-01), amounts int64 cents
+    and categories int16 codes into the categories array. Date ranges are
+    found with two binary searches and returned as views of the same arrays,
+    so a range query costs O(log n + k) and copies nothing.
+    """
+    
+    def __init__(self, ids, days, amount_cents, category_codes, categories, descriptions):
+        self.ids = ids
+        self.days = days
+        self.amount_cents = amount_cents
+        self.category_codes = category_codes
+        self.categories = categories
+        self.descriptions = descriptions
+        self._category_index = {category: code for code, category in enumerate(categories)}
+    
+    @classmethod
+    def from_columns(cls, columns):
+        """Build a store from the arrays returned by get_expense_columns."""
+        days = columns["date"].astype(np.int64).astype(np.int32)
+        # A stable sort keeps same-day expenses in id order; already-sorted input is O(n)
+        order = np.argsort(days, kind="stable")
+        category_codes, categories = encode_categories(columns["category"][order])
+        return cls(
+            columns["id"][order],
+            days[order],
+            columns["amount_cents"][order],
+            category_codes,
+            categories,
+            columns["description"][order]
+        )
+    
+    @classmethod
+    def from_expenses(cls, expenses):
+        """Build a store from a list of expense dicts."""
+        return cls.from_columns({
+            "id": np.array([expense.get("id", -1) for expense in expenses], dtype=np.int64),
+            "date": np.array([str(expense["date"])[:10] for expense in expenses], dtype="datetime64[D]"),
+            "amount_cents": np.array([
+                expense["amount_cents"] if "amount_cents" in expense else to_cents(expense["amount"])
+                for expense in expenses
+            ], dtype=np.int64),
+            "category": np.array([expense["category"] for expense in expenses], dtype=object),
+            "description": np.array([expense["description"] for expense in expenses], dtype=object)
+        })
+    
+    def __len__(self):
+        return len(self.days)
+    
+    def date_range(self, start_date=None, end_date=None):
+        """Get the store for expenses between two inclusive dates, as views into this one."""
+        start = 0 if start_date is None else np.searchsorted(self.days, _day_ordinal(start_date), side="left")
+        end = len(self.days) if end_date is None else np.searchsorted(self.days, _day_ordinal(end_date), side="right")
+        return self[start:end]
+    
+    def __getitem__(self, index):
+        """Select rows by slice (views) or by boolean mask / index array (copies)."""
+        return ExpenseStore(
+            self.ids[index],
+            self.days[index],
+            self.amount_cents[index],
+            self.category_codes[index],
+            self.categories,
+            self.descriptions[index]
+        )
+    
+    @property
+    def dates(self):
+        """The expense dates as a datetime64[D] array."""
+        return self.days.astype("datetime64[D]")
+    
+    def category_code(self, category):
+        """Get the code of a category, or -1 if no expense uses it."""
+        return self._category_index.get(category, -1)
+    
+    def total(self):
+        """Total of the expenses in dollars."""
+        return from_cents(int(self.amount_cents.sum()))
+    
+    def category_totals(self):
+        """Totals in dollars by category."""
+        cents = np.bincount(self.category_codes, weights=self.amount_cents, minlength=len(self.categories))
+        return {category: total / 100 for category, total in zip(self.categories, cents.tolist()) if total}
+    
+    def month_category_totals(self):
+        """Totals in dollars as {"YYYY-MM": {category: total}}, in month order."""
+        months = self.dates.astype("datetime64[M]")
+        month_keys, month_index = np.unique(months, return_inverse=True)
+        # One bincount over combined (month, category) codes
+        category_count = len(self.categories)
+        cents = np.bincount(
+            month_index * category_count + self.category_codes,
+            weights=self.amount_cents,
+            minlength=len(month_keys) * category_count
+        ).reshape(len(month_keys), category_count)
+        result = {}
+        for month, row in zip(np.datetime_as_string(month_keys, unit="M"), cents.tolist()):
+            result[str(month)] = {self.categories[code]: total / 100 for code, total in enumerate(row) if total}
+        return result
+    
+    def to_records(self):
+        """Convert the expenses to dicts shaped like Expense.to_dict()."""
+        dates = np.datetime_as_string(self.dates, unit="D")
+        return [
+            {
+                "id": int(expense_id),
+                "description": description,
+                "amount": from_cents(int(cents)),
+                "amount_cents": int(cents),
+                "date": str(date_text),
+                "category": self.categories[code]
+            }
+            for expense_id, description, cents, date_text, code in zip(
+                self.ids, self.descriptions, self.amount_cents, dates, self.category_codes
+            )
+        ]
+
+def _get_cached(kind, user_id, loader):
+    """
+    Get a cached per-user value, rebuilding it with loader(user_id) only when
+    the user's dataset version changed.
+    """
+    # Read the version before loading so a concurrent write forces a reload next time
+    version = get_expense_version(user_id)
+    key = (kind, user_id)
+    with _expense_cache_lock:
+        cached = _expense_cache.get(key)
+        if cached is not None and cached[0] == version:
+            _expense_cache.move_to_end(key)
+            return cached[1]
+    
+    value = loader(user_id)
+    with _expense_cache_lock:
+        _expense_cache[key] = (version, value)
+        _expense_cache.move_to_end(key)
+        while len(_expense_cache) > EXPENSE_CACHE_SIZE:
+            _expense_cache.popitem(last=False)
+    return value
+
+def get_expense_store(expenses=None, user_id=DEFAULT_USER_ID):
+    """
+    Get an ExpenseStore for an expense list, or the user's cached store when
+    no list is given. The cached store is shared and must not be modified.
+    """
+    if expenses is None:
+        return _get_cached("store", user_id, lambda user: ExpenseStore.from_columns(get_expense_columns(user_id=user)))
+    return ExpenseStore.from_expenses(expenses)
+
 def get_expense_dataframe(expenses):
     """
     Convert the expenses list to a pandas DataFrame.
@@ -12,87 +280,128 @@ def get_expense_dataframe(expenses):
     df = pd.DataFrame(expenses)
     # Convert date strings to datetime objects
     df["date"] = pd.to_datetime(df["date"])
-    # Convert amount strings to float
-    df["amount"] = df["amount"].astype(float)
+    df["category"] = pd.Categorical(df["category"], categories=get_category_list(df["category"]))
+    # Derive dollars from integer cents when available to avoid float parsing
+    if "amount_cents" in df.columns:
+        df["amount"] = df["amount_cents"] / 100
+    else:
+        df["amount"] = df["amount"].astype(float)
     
     return df
 
-def get_expenses_by_category(expenses):
+def get_current_month_range():
+    """
+    Return the first and last day of the current month.
+    """
+    today = datetime.now().date()
+    start_of_month = today.replace(day=1)
+    end_of_month = today.replace(day=calendar.monthrange(today.year, today.month)[1])
+    return start_of_month, end_of_month
+
+def get_expenses_by_category(expenses=None, filters=None, user_id=DEFAULT_USER_ID):
     """
     Group expenses by category and calculate totals.
+    When no expense list is given, the user's totals are computed by the database.
     """
-    df = get_expense_dataframe(expenses)
-    if df.empty:
-        return {}
+    if expenses is None:
+        return get_expense_totals_by_category(filters, user_id)
     
-    grouped = df.groupby("category")["amount"].sum().to_dict()
-    return grouped
+    # Sum integer cents per category code with bincount
+    return get_expense_store(expenses).category_totals()
 
-def get_expenses_by_date(expenses, period="month"):
+def bucket_period_starts(dates, period="month", week_start=WEEK_START):
     """
-    Group expenses by date (day, week, month, or year).
+    Map dates to the first day of their day, week, month, quarter or year.
+    Works on whole datetime64 arrays, so there is no Python call per row.
     """
-    df = get_expense_dataframe(expenses)
-    if df.empty:
-        return {}
-    
+    days = np.asarray(dates, dtype="datetime64[D]")
     if period == "day":
-        df["period"] = df["date"].dt.date
+        return days
     elif period == "week":
-        df["period"] = df["date"].dt.to_period("W").apply(lambda x: x.start_time.date())
+        # Day 0 of the epoch, 1970-01-01, was a Thursday (3 counting from Monday = 0)
+        day_numbers = days.astype(np.int64)
+        days_into_week = (day_numbers + 3 - week_start) % 7
+        return (day_numbers - days_into_week).astype("datetime64[D]")
     elif period == "month":
-        df["period"] = df["date"].dt.to_period("M").apply(lambda x: x.start_time.date())
-    else:  # year
-        df["period"] = df["date"].dt.to_period("Y").apply(lambda x: x.start_time.date())
+        return days.astype("datetime64[M]").astype("datetime64[D]")
+    elif period == "quarter":
+        # Month 0 of the epoch is January, so quarters start at multiples of three
+        month_numbers = days.astype("datetime64[M]").astype(np.int64)
+        return (month_numbers - month_numbers % 3).astype("datetime64[M]").astype("datetime64[D]")
+    elif period == "year":
+        return days.astype("datetime64[Y]").astype("datetime64[D]")
+    raise ValueError(f"Unknown period: {period}")
+
+def get_period_totals(expenses=None, period="month", week_start=WEEK_START, user_id=DEFAULT_USER_ID):
+    """
+    Total expenses per day, week, month, quarter or year.
+    Returns (period_starts, totals): the period start dates as a sorted
+    datetime64[D] array and the matching totals in dollars.
+    """
+    if expenses is None and period in ("month", "quarter", "year"):
+        # Whole-month periods are served from the database's monthly rollup
+        totals_by_period = get_expense_totals_by_period(period, user_id=user_id)
+        return (
+            np.array(list(totals_by_period.keys()), dtype="datetime64[D]"),
+            np.array(list(totals_by_period.values()), dtype=np.float64)
+        )
     
-    grouped = df.groupby("period")["amount"].sum().to_dict()
-    # Convert keys back to strings
-    grouped = {str(k): v for k, v in grouped.items()}
+    store = get_expense_store(expenses, user_id)
+    if not len(store):
+        return np.array([], dtype="datetime64[D]"), np.array([], dtype=np.float64)
     
-    return grouped
+    starts = bucket_period_starts(store.dates, period, week_start)
+    # The store is date-sorted, so the bucket starts already are too
+    period_starts, bucket_index = np.unique(starts, return_inverse=True)
+    totals = np.bincount(bucket_index, weights=store.amount_cents, minlength=len(period_starts)) / 100
+    return period_starts, totals
 
-def get_this_month_expenses(expenses):
+def get_expenses_by_date(expenses=None, period="month", user_id=DEFAULT_USER_ID, week_start=WEEK_START):
     """
-    Filter expenses for the current month.
+    Group expenses by date (day, week, month, quarter, or year).
+    When no expense list is given, the user's totals are computed by the database.
     """
-    df = get_expense_dataframe(expenses)
-    if df.empty:
-        return []
+    if expenses is None:
+        return get_expense_totals_by_period(period, user_id=user_id, week_start=week_start)
     
-    today = datetime.now()
-    start_of_month = datetime(today.year, today.month, 1)
-    end_of_month = datetime(today.year, today.month, calendar.monthrange(today.year, today.month)[1])
-    
-    monthly_df = df[(df["date"] >= start_of_month) & (df["date"] <= end_of_month)]
-    return monthly_df.to_dict("records")
+    period_starts, totals = get_period_totals(expenses, period, week_start)
+    return dict(zip(np.datetime_as_string(period_starts, unit="D"), totals.tolist()))
+
+def get_this_month_expenses(expenses=None, user_id=DEFAULT_USER_ID):
+    """
+    Filter expenses for the current month.
+    """
+    start_of_month, end_of_month = get_current_month_range()
+    return get_expense_store(expenses, user_id).date_range(start_of_month, end_of_month).to_records()
 
-def get_monthly_breakdown(expenses):
+def get_monthly_breakdown(expenses=None, filters=None, user_id=DEFAULT_USER_ID):
     """
     Break down expenses by month and category.
+    When no expense list is given, the user's totals are computed by the database.
     """
-    df = get_expense_dataframe(expenses)
-    if df.empty:
-        return {}
+    if expenses is None:
+        return get_monthly_category_totals(filters, user_id)
     
-    # Add month column
-    df["month"] = df["date"].dt.to_period("M").astype(str)
-    
-    # Group by month and category
-    result = {}
-    for month, month_df in df.groupby("month"):
-        result[month] = month_df.groupby("category")["amount"].sum().to_dict()
-    
-    return result
+    return get_expense_store(expenses).month_category_totals()
 
-def calculate_budget_progress(expenses, budgets):
+def calculate_budget_progress(expenses, budgets, user_id=DEFAULT_USER_ID, monthly_expenses=None):
     """
     Calculate budget progress for each category.
+    monthly_expenses optionally supplies this month's totals by category,
+    e.g. from ExpenseAggregates, so they are not recomputed.
     """
     if not budgets:
         return {}
     
     # Get monthly expenses by category
-    monthly_expenses = get_expenses_by_category(get_this_month_expenses(expenses))
+    if monthly_expenses is None and expenses is None:
+        start_of_month, end_of_month = get_current_month_range()
+        monthly_expenses = get_expenses_by_category(
+            filters={"start_date": start_of_month, "end_date": end_of_month},
+            user_id=user_id
+        )
+    elif monthly_expenses is None:
+        monthly_expenses = get_expenses_by_category(get_this_month_expenses(expenses))
     
     # Calculate progress
     progress = {}
@@ -114,30 +423,22 @@ def calculate_budget_progress(expenses, budgets):
     
     return progress
 
-def filter_expenses(expenses, start_date=None, end_date=None, category=None, min_amount=None, max_amount=None):
+def filter_expenses(expenses, start_date=None, end_date=None, category=None, min_amount=None, max_amount=None, user_id=DEFAULT_USER_ID):
     """
     Filter expenses based on various criteria.
+    Pass None as expenses to filter the user's stored expenses.
     """
-    df = get_expense_dataframe(expenses)
-    if df.empty:
-        return []
-    
-    # Apply filters
-    if start_date:
-        start_date = pd.to_datetime(start_date)
-        df = df[df["date"] >= start_date]
-    
-    if end_date:
-        end_date = pd.to_datetime(end_date)
-        df = df[df["date"] <= end_date]
+    # Narrow to the date range with binary searches, then mask only that slice
+    store = get_expense_store(expenses, user_id).date_range(start_date or None, end_date or None)
     
+    mask = np.ones(len(store), dtype=bool)
     if category and category != "All":
-        df = df[df["category"] == category]
+        mask &= store.category_codes == store.category_code(category)
     
     if min_amount is not None:
-        df = df[df["amount"] >= float(min_amount)]
+        mask &= store.amount_cents >= to_cents(min_amount)
     
     if max_amount is not None:
-        df = df[df["amount"] <= float(max_amount)]
+        mask &= store.amount_cents <= to_cents(max_amount)
     
-    return df.to_dict("records")
+    return store[mask].to_records()
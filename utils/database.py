@@ -1,47 +1,160 @@
 import os
 import json
 import logging
-from datetime import datetime
-from sqlalchemy import create_engine, Column, Integer, String, Float, Date, ForeignKey, Text, JSON, text
+import threading
+from datetime import datetime, date, timedelta
+from functools import lru_cache
+from sqlalchemy import create_engine, Column, Integer, String, Float, Date, DateTime, ForeignKey, Text, JSON, Index, UniqueConstraint, text, func, and_, or_, event, inspect, select, type_coerce, cast
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+import numpy as np
 import pandas as pd
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Use SQLite directly for better reliability and to avoid connection errors
-logger.info("Using SQLite database for data storage")
-engine = create_engine("sqlite:///finance_assistant.db", connect_args={"check_same_thread": False})
+# SQLite connection settings, overridable through environment variables
+DATABASE_PATH = os.environ.get("FINANCE_DB_PATH", "finance_assistant.db")
+SQLITE_JOURNAL_MODE = os.environ.get("FINANCE_DB_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.environ.get("FINANCE_DB_SYNCHRONOUS", "NORMAL")
+SQLITE_CACHE_SIZE_KB = int(os.environ.get("FINANCE_DB_CACHE_SIZE_KB", "65536"))
+SQLITE_MMAP_SIZE = int(os.environ.get("FINANCE_DB_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("FINANCE_DB_BUSY_TIMEOUT_MS", "5000"))
+
+# Owner of rows created before data was partitioned by user, and of data
+# written by scripts that run outside a signed-in session
+DEFAULT_USER_ID = os.environ.get("FINANCE_DEFAULT_USER_ID", "demo_user_id")
+
+# First day of the week for weekly totals, 0 = Monday through 6 = Sunday
+WEEK_START = int(os.environ.get("FINANCE_WEEK_START", "0"))
+
+# Number of rows sent per executemany call by the bulk insert helpers
+BULK_INSERT_CHUNK_SIZE = 10000
+EXPENSE_INSERT_SQL = "INSERT INTO expenses (user_id, description, amount_cents, date, category) VALUES (?, ?, ?, ?, ?)"
+# Finds the nth (OFFSET) of a user's expenses matching the (description,
+# amount, date) natural key, in id order; served by ix_expenses_user_date
+EXPENSE_KEY_MATCH_SQL = (
+    "SELECT id, category FROM expenses "
+    "WHERE user_id = ? AND description = ? AND amount_cents = ? AND date = ? "
+    "ORDER BY id LIMIT 1 OFFSET ?"
+)
+
+# Adds signed deltas to a user's month x category rollup row, creating it if needed
+ROLLUP_UPSERT_SQL = (
+    "INSERT INTO monthly_category_totals (user_id, month, category, total_cents, expense_count) "
+    "VALUES (?, ?, ?, ?, ?) "
+    "ON CONFLICT (user_id, month, category) DO UPDATE SET "
+    "total_cents = total_cents + excluded.total_cents, expense_count = expense_count + excluded.expense_count"
+)
+# Recomputes rollup rows from the raw expenses, optionally for a single user
+ROLLUP_SELECT_SQL = (
+    "SELECT user_id, strftime('%Y-%m', date) AS month, category, SUM(amount_cents), COUNT(*) "
+    "FROM expenses {where} GROUP BY user_id, month, category"
+)
+
+# Expense categorization cache limits: entries older than the TTL are
+# ignored and the least recently used entries are evicted beyond the cap
+CATEGORY_CACHE_TTL_DAYS = int(os.environ.get("FINANCE_CATEGORY_CACHE_TTL_DAYS", "90"))
+CATEGORY_CACHE_MAX_ENTRIES = int(os.environ.get("FINANCE_CATEGORY_CACHE_MAX_ENTRIES", "10000"))
+# A cache hit only records its use when the entry's last_used_at is older
+# than this, so most lookups are plain reads rather than write transactions
+CATEGORY_CACHE_TOUCH_INTERVAL_SECONDS = int(os.environ.get("FINANCE_CATEGORY_CACHE_TOUCH_INTERVAL_SECONDS", "3600"))
+
+# Number of expenses fetched per round trip when streaming an export
+EXPORT_CHUNK_SIZE = 5000
+
+def _configure_sqlite_connection(dbapi_connection, connection_record):
+    """Apply the performance pragmas to every new SQLite connection."""
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA journal_mode = {SQLITE_JOURNAL_MODE}")
+        cursor.execute(f"PRAGMA synchronous = {SQLITE_SYNCHRONOUS}")
+        # A negative cache_size is measured in KiB rather than pages
+        cursor.execute(f"PRAGMA cache_size = -{SQLITE_CACHE_SIZE_KB}")
+        cursor.execute(f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE}")
+        cursor.execute(f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute("PRAGMA foreign_keys = ON")
+    finally:
+        cursor.close()
+
+@lru_cache(maxsize=None)
+def _create_engine(database_path):
+    # Use SQLite directly for better reliability and to avoid connection errors
+    logger.info("Using SQLite database for data storage")
+    new_engine = create_engine(f"sqlite:///{database_path}", connect_args={"check_same_thread": False})
+    event.listen(new_engine, "connect", _configure_sqlite_connection)
+    return new_engine
+
+def get_engine(database_path=DATABASE_PATH):
+    """
+    Create the database engine once per process so every Streamlit session
+    shares a single connection pool.
+    """
+    # Cache on the path alone, so get_engine() and get_engine(path) share an engine
+    return _create_engine(database_path)
+
+@lru_cache(maxsize=None)
+def _create_session_factory(database_path):
+    return sessionmaker(bind=get_engine(database_path))
+
+def get_session_factory(database_path=DATABASE_PATH):
+    """Get the process-wide session factory bound to the shared engine."""
+    return _create_session_factory(database_path)
+
+engine = get_engine()
+
+def to_cents(amount):
+    """Convert a dollar amount (number or numeric string) to integer cents."""
+    return int(round(float(amount) * 100))
+
+def from_cents(cents):
+    """Convert integer cents to a dollar amount for display and charts."""
+    return (cents or 0) / 100
 
 Base = declarative_base()
-Session = sessionmaker(bind=engine)
+Session = get_session_factory()
 
 # Define models
 class Expense(Base):
     __tablename__ = "expenses"
     
     id = Column(Integer, primary_key=True)
+    user_id = Column(String(255), nullable=False, default=DEFAULT_USER_ID)
     description = Column(String(255), nullable=False)
-    amount = Column(Float, nullable=False)
+    # Stored as integer cents so totals are exact
+    amount_cents = Column(Integer, nullable=False)
     date = Column(Date, nullable=False)
     category = Column(String(50), nullable=False)
     
+    # user_id leads every index so per-user queries only touch that user's rows
+    __table_args__ = (
+        Index("ix_expenses_user_date", "user_id", "date"),
+        Index("ix_expenses_user_category_date", "user_id", "category", "date"),
+        Index("ix_expenses_user_amount_cents", "user_id", "amount_cents"),
+    )
+    
+    @property
+    def amount(self):
+        return from_cents(self.amount_cents)
+    
     def to_dict(self):
         return {
             "id": self.id,
             "description": self.description,
-            "amount": str(self.amount),
+            "amount": self.amount,
+            "amount_cents": self.amount_cents,
             "date": self.date.strftime("%Y-%m-%d"),
             "category": self.category
         }
     
     @classmethod
-    def from_dict(cls, data):
+    def from_dict(cls, data, user_id=DEFAULT_USER_ID):
         return cls(
+            user_id=user_id,
             description=data["description"],
-            amount=float(data["amount"]),
+            amount_cents=to_cents(data["amount"]),
             date=datetime.strptime(data["date"], "%Y-%m-%d").date(),
             category=data["category"]
         )
@@ -50,9 +163,14 @@ class Budget(Base):
     __tablename__ = "budgets"
     
     id = Column(Integer, primary_key=True)
-    category = Column(String(50), unique=True, nullable=False)
+    user_id = Column(String(255), nullable=False, default=DEFAULT_USER_ID)
+    category = Column(String(50), nullable=False)
     amount = Column(Float, nullable=False)
     
+    __table_args__ = (
+        UniqueConstraint("user_id", "category", name="uq_budgets_user_category"),
+    )
+    
     def to_dict(self):
         return {
             "id": self.id,
@@ -64,6 +182,7 @@ class Goal(Base):
     __tablename__ = "goals"
     
     id = Column(Integer, primary_key=True)
+    user_id = Column(String(255), nullable=False, default=DEFAULT_USER_ID)
     name = Column(String(255), nullable=False)
     target_amount = Column(Float, nullable=False)
     current_amount = Column(Float, nullable=False, default=0)
@@ -73,6 +192,10 @@ class Goal(Base):
     created_date = Column(Date, nullable=False, default=datetime.now().date())
     progress_updates = Column(JSON, nullable=True)
     
+    __table_args__ = (
+        Index("ix_goals_user", "user_id"),
+    )
+    
     def to_dict(self):
         return {
             "id": self.id,
@@ -87,8 +210,9 @@ class Goal(Base):
         }
     
     @classmethod
-    def from_dict(cls, data):
+    def from_dict(cls, data, user_id=DEFAULT_USER_ID):
         return cls(
+            user_id=user_id,
             name=data["name"],
             target_amount=float(data["target_amount"]),
             current_amount=float(data["current_amount"]),
@@ -103,9 +227,14 @@ class Insight(Base):
     __tablename__ = "insights"
     
     id = Column(Integer, primary_key=True)
+    user_id = Column(String(255), nullable=False, default=DEFAULT_USER_ID)
     content = Column(Text, nullable=False)
     created_date = Column(Date, nullable=False, default=datetime.now().date())
     
+    __table_args__ = (
+        Index("ix_insights_user", "user_id"),
+    )
+    
     def to_dict(self):
         return {
             "id": self.id,
@@ -113,78 +242,593 @@ class Insight(Base):
             "created_date": self.created_date.strftime("%Y-%m-%d")
         }
 
+class MonthlyCategoryTotal(Base):
+    """
+    Per-user spending totals by month and category, kept in step with the
+    expenses table by every expense write so charts never scan raw rows.
+    """
+    __tablename__ = "monthly_category_totals"
+    
+    user_id = Column(String(255), primary_key=True)
+    # "YYYY-MM"
+    month = Column(String(7), primary_key=True)
+    category = Column(String(50), primary_key=True)
+    total_cents = Column(Integer, nullable=False, default=0)
+    expense_count = Column(Integer, nullable=False, default=0)
+
+class CategoryCacheEntry(Base):
+    """
+    A category assigned to a normalized expense description, shared by all
+    users so repeat merchants are categorized without an API call.
+    """
+    __tablename__ = "category_cache"
+    
+    description_key = Column(String(255), primary_key=True)
+    category = Column(String(50), nullable=False)
+    created_at = Column(DateTime, nullable=False)
+    last_used_at = Column(DateTime, nullable=False)
+    hit_count = Column(Integer, nullable=False, default=0)
+    
+    __table_args__ = (
+        Index("ix_category_cache_last_used_at", "last_used_at"),
+    )
+
+class LLMResult(Base):
+    """
+    The latest AI result of each kind for a user, stored with a fingerprint of
+    the input it was generated from so unchanged data is not sent again.
+    """
+    __tablename__ = "llm_results"
+    
+    user_id = Column(String(255), primary_key=True)
+    kind = Column(String(50), primary_key=True)
+    fingerprint = Column(String(64), nullable=False)
+    result = Column(JSON, nullable=False)
+    created_at = Column(DateTime, nullable=False)
+
+# Schema migrations
+# Each migration spells out its own DDL so it keeps working as the models change
+def _migrate_expense_indexes(connection):
+    """Add the expense date/category/amount indexes to databases created before they existed."""
+    connection.execute(text("CREATE INDEX IF NOT EXISTS ix_expenses_date ON expenses (date)"))
+    connection.execute(text("CREATE INDEX IF NOT EXISTS ix_expenses_category_date ON expenses (category, date)"))
+    connection.execute(text("CREATE INDEX IF NOT EXISTS ix_expenses_amount ON expenses (amount)"))
+
+def _table_columns(connection, table_name):
+    """Get the column names of a table, or an empty set if it does not exist yet."""
+    return {row[1] for row in connection.exec_driver_sql(f"PRAGMA table_info({table_name})")}
+
+def _migrate_user_partitioning(connection):
+    """Partition every table by user_id, assigning existing rows to DEFAULT_USER_ID."""
+    default_user_literal = "'" + DEFAULT_USER_ID.replace("'", "''") + "'"
+    for table_name in ("expenses", "goals", "insights"):
+        columns = _table_columns(connection, table_name)
+        if columns and "user_id" not in columns:
+            connection.exec_driver_sql(
+                f"ALTER TABLE {table_name} ADD COLUMN user_id VARCHAR(255) NOT NULL DEFAULT {default_user_literal}"
+            )
+    
+    # Budget categories become unique per user; SQLite cannot drop the old
+    # UNIQUE(category) constraint in place, so the table is rebuilt
+    columns = _table_columns(connection, "budgets")
+    if columns and "user_id" not in columns:
+        connection.exec_driver_sql("ALTER TABLE budgets RENAME TO budgets_old")
+        connection.exec_driver_sql(
+            "CREATE TABLE budgets ("
+            "id INTEGER NOT NULL, user_id VARCHAR(255) NOT NULL, category VARCHAR(50) NOT NULL, "
+            "amount FLOAT NOT NULL, PRIMARY KEY (id), "
+            "CONSTRAINT uq_budgets_user_category UNIQUE (user_id, category))"
+        )
+        connection.execute(
+            text("INSERT INTO budgets (id, user_id, category, amount) SELECT id, :user_id, category, amount FROM budgets_old"),
+            {"user_id": DEFAULT_USER_ID}
+        )
+        connection.exec_driver_sql("DROP TABLE budgets_old")
+    
+    # Replace the single-tenant expense indexes with user-leading ones
+    for index_name in ("ix_expenses_date", "ix_expenses_category_date", "ix_expenses_amount"):
+        connection.exec_driver_sql(f"DROP INDEX IF EXISTS {index_name}")
+    connection.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_expenses_user_date ON expenses (user_id, date)")
+    connection.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_expenses_user_category_date ON expenses (user_id, category, date)"
+    )
+    connection.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_expenses_user_amount ON expenses (user_id, amount)")
+    if _table_columns(connection, "goals"):
+        connection.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_goals_user ON goals (user_id)")
+    if _table_columns(connection, "insights"):
+        connection.exec_driver_sql("CREATE INDEX IF NOT EXISTS ix_insights_user ON insights (user_id)")
+
+def _migrate_amount_cents(connection):
+    """Store expense amounts as integer cents, rounding the existing float amounts."""
+    if "amount_cents" in _table_columns(connection, "expenses"):
+        return
+    # A REAL column would coerce integers back to floats, so the table is rebuilt
+    connection.exec_driver_sql("ALTER TABLE expenses RENAME TO expenses_old")
+    for index_name in ("ix_expenses_user_date", "ix_expenses_user_category_date", "ix_expenses_user_amount"):
+        connection.exec_driver_sql(f"DROP INDEX IF EXISTS {index_name}")
+    connection.exec_driver_sql(
+        "CREATE TABLE expenses ("
+        "id INTEGER NOT NULL, user_id VARCHAR(255) NOT NULL, description VARCHAR(255) NOT NULL, "
+        "amount_cents INTEGER NOT NULL, date DATE NOT NULL, category VARCHAR(50) NOT NULL, PRIMARY KEY (id))"
+    )
+    connection.exec_driver_sql(
+        "INSERT INTO expenses (id, user_id, description, amount_cents, date, category) "
+        "SELECT id, user_id, description, CAST(ROUND(amount * 100) AS INTEGER), date, category FROM expenses_old"
+    )
+    connection.exec_driver_sql("DROP TABLE expenses_old")
+    connection.exec_driver_sql("CREATE INDEX ix_expenses_user_date ON expenses (user_id, date)")
+    connection.exec_driver_sql("CREATE INDEX ix_expenses_user_category_date ON expenses (user_id, category, date)")
+    connection.exec_driver_sql("CREATE INDEX ix_expenses_user_amount_cents ON expenses (user_id, amount_cents)")
+
+def _migrate_monthly_rollup(connection):
+    """Create the monthly category rollup table and fill it from the existing expenses."""
+    connection.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS monthly_category_totals ("
+        "user_id VARCHAR(255) NOT NULL, month VARCHAR(7) NOT NULL, category VARCHAR(50) NOT NULL, "
+        "total_cents INTEGER NOT NULL, expense_count INTEGER NOT NULL, "
+        "PRIMARY KEY (user_id, month, category))"
+    )
+    _rebuild_rollup(connection)
+
+def _migrate_category_cache(connection):
+    """Create the expense categorization cache table."""
+    connection.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS category_cache ("
+        "description_key VARCHAR(255) NOT NULL, category VARCHAR(50) NOT NULL, "
+        "created_at DATETIME NOT NULL, last_used_at DATETIME NOT NULL, hit_count INTEGER NOT NULL, "
+        "PRIMARY KEY (description_key))"
+    )
+    connection.exec_driver_sql(
+        "CREATE INDEX IF NOT EXISTS ix_category_cache_last_used_at ON category_cache (last_used_at)"
+    )
+
+def _migrate_llm_results(connection):
+    """Create the table of memoized AI results."""
+    connection.exec_driver_sql(
+        "CREATE TABLE IF NOT EXISTS llm_results ("
+        "user_id VARCHAR(255) NOT NULL, kind VARCHAR(50) NOT NULL, fingerprint VARCHAR(64) NOT NULL, "
+        "result JSON NOT NULL, created_at DATETIME NOT NULL, PRIMARY KEY (user_id, kind))"
+    )
+
+# Ordered (version, migration) pairs; the applied version is kept in SQLite's user_version pragma
+MIGRATIONS = [
+    (1, _migrate_expense_indexes),
+    (2, _migrate_user_partitioning),
+    (3, _migrate_amount_cents),
+    (4, _migrate_monthly_rollup),
+    (5, _migrate_category_cache),
+    (6, _migrate_llm_results),
+]
+
+def get_schema_version(connection):
+    """Get the schema version recorded in the database."""
+    return connection.execute(text("PRAGMA user_version")).scalar() or 0
+
+def set_schema_version(connection, version):
+    """Record the schema version in the database."""
+    connection.execute(text(f"PRAGMA user_version = {int(version)}"))
+
+def run_migrations():
+    """Apply any migrations newer than the database's schema version."""
+    with engine.begin() as connection:
+        current_version = get_schema_version(connection)
+        for version, migration in MIGRATIONS:
+            if version > current_version:
+                logger.info(f"Applying database migration {version}: {migration.__name__}")
+                migration(connection)
+                set_schema_version(connection, version)
+
+# Dataset versions
+# Per-user counters bumped by every expense write, so in-process caches of
+# expense data can tell when they are stale
+_expense_versions = {}
+_expense_versions_lock = threading.Lock()
+
+def get_expense_version(user_id=DEFAULT_USER_ID):
+    """Get the current version of a user's expense data."""
+    with _expense_versions_lock:
+        return _expense_versions.get(user_id, 0)
+
+def _bump_expense_version(user_id):
+    """Mark a user's expense data as changed."""
+    with _expense_versions_lock:
+        _expense_versions[user_id] = _expense_versions.get(user_id, 0) + 1
+
+# Per-user counters bumped when expenses are deleted or replaced rather than
+# only added. Expense ids can then be reused, so state built incrementally
+# from ids must be rebuilt.
+_expense_resets = {}
+
+def get_expense_reset_count(user_id=DEFAULT_USER_ID):
+    """Get how many times a user's expenses have been deleted or replaced in this process."""
+    with _expense_versions_lock:
+        return _expense_resets.get(user_id, 0)
+
+def _bump_expense_reset(user_id):
+    """Mark a user's expenses as deleted or replaced, which also changes their version."""
+    with _expense_versions_lock:
+        _expense_resets[user_id] = _expense_resets.get(user_id, 0) + 1
+        _expense_versions[user_id] = _expense_versions.get(user_id, 0) + 1
+
+# Monthly rollup maintenance
+def _add_rollup_delta(deltas, month, category, cents, count=1):
+    """Accumulate a change to one month x category total in a {(month, category): (cents, count)} dict."""
+    total_cents, expense_count = deltas.get((month, category), (0, 0))
+    deltas[(month, category)] = (total_cents + cents, expense_count + count)
+
+def _apply_rollup_deltas(connection, user_id, deltas):
+    """Add accumulated deltas to a user's rollup rows within the caller's transaction."""
+    if not deltas:
+        return
+    connection.exec_driver_sql(ROLLUP_UPSERT_SQL, [
+        (user_id, month, category, cents, count) for (month, category), (cents, count) in deltas.items()
+    ])
+    if any(count < 0 for _, count in deltas.values()):
+        # Drop months and categories whose expenses have all been deleted
+        connection.exec_driver_sql(
+            "DELETE FROM monthly_category_totals WHERE user_id = ? AND expense_count <= 0", (user_id,)
+        )
+
+def _rebuild_rollup(connection, user_id=None):
+    """Recompute rollup rows from the raw expenses, for one user or for everyone."""
+    insert_sql = "INSERT INTO monthly_category_totals (user_id, month, category, total_cents, expense_count) "
+    if user_id is None:
+        connection.exec_driver_sql("DELETE FROM monthly_category_totals")
+        connection.exec_driver_sql(insert_sql + ROLLUP_SELECT_SQL.format(where=""))
+    else:
+        connection.exec_driver_sql("DELETE FROM monthly_category_totals WHERE user_id = ?", (user_id,))
+        connection.exec_driver_sql(insert_sql + ROLLUP_SELECT_SQL.format(where="WHERE user_id = ?"), (user_id,))
+
+def rebuild_monthly_rollup(user_id=None):
+    """Recompute the monthly category rollup from the raw expenses, for one user or for everyone."""
+    with engine.begin() as connection:
+        _rebuild_rollup(connection, user_id)
+
+def verify_monthly_rollup(user_id=None):
+    """
+    Compare the monthly category rollup against totals recomputed from the raw expenses.
+    
+    Returns a list of (user_id, month, category, stored, expected) mismatches,
+    where stored and expected are (total_cents, expense_count) pairs or None
+    for a missing row. An empty list means the rollup is in step.
+    """
+    where, params = ("", ()) if user_id is None else ("WHERE user_id = ?", (user_id,))
+    with engine.connect() as connection:
+        expected = {
+            (row[0], row[1], row[2]): (row[3], row[4])
+            for row in connection.exec_driver_sql(ROLLUP_SELECT_SQL.format(where=where), params)
+        }
+        stored = {
+            (row[0], row[1], row[2]): (row[3], row[4])
+            for row in connection.exec_driver_sql(
+                f"SELECT user_id, month, category, total_cents, expense_count FROM monthly_category_totals {where}", params
+            )
+        }
+    return [
+        (*key, stored.get(key), expected.get(key))
+        for key in sorted(expected.keys() | stored.keys())
+        if stored.get(key) != expected.get(key)
+    ]
+
 # Database operations
 def init_db():
-    """Initialize the database tables."""
-    Base.metadata.create_all(engine)
+    """Initialize the database tables and bring existing databases up to date."""
+    with engine.connect() as connection:
+        is_new_database = not inspect(connection).has_table(Expense.__tablename__)
+    
+    if is_new_database:
+        # Fresh databases are created with the current schema and need no migrations
+        Base.metadata.create_all(engine)
+        with engine.begin() as connection:
+            set_schema_version(connection, MIGRATIONS[-1][0])
+    else:
+        run_migrations()
+        Base.metadata.create_all(engine)
 
-def get_all_expenses():
-    """Get all expenses from the database."""
+def get_all_expenses(user_id=DEFAULT_USER_ID):
+    """Get all of a user's expenses from the database."""
     session = Session()
     try:
-        expenses = session.query(Expense).all()
+        expenses = session.query(Expense).filter(Expense.user_id == user_id).all()
         return [expense.to_dict() for expense in expenses]
     finally:
         session.close()
 
-def add_expense(expense_data):
+def get_expense_labels(after_id=0, user_id=DEFAULT_USER_ID):
+    """
+    Get (id, description, category) tuples for a user's expenses with ids
+    above after_id, in id order, for incrementally training a categorizer.
+    """
+    table = Expense.__table__
+    statement = select(table.c.id, table.c.description, table.c.category).where(
+        table.c.user_id == user_id, table.c.id > after_id
+    ).order_by(table.c.id)
+    with engine.connect() as connection:
+        return [tuple(row) for row in connection.execute(statement)]
+
+def add_expense(expense_data, user_id=DEFAULT_USER_ID):
     """Add a new expense to the database."""
     session = Session()
     try:
-        expense = Expense.from_dict(expense_data)
+        expense = Expense.from_dict(expense_data, user_id)
         session.add(expense)
+        # Update the rollup in the same transaction as the insert
+        session.flush()
+        _apply_rollup_deltas(session.connection(), user_id, {
+            (expense.date.strftime("%Y-%m"), expense.category): (expense.amount_cents, 1)
+        })
         session.commit()
+        _bump_expense_version(user_id)
         return expense.to_dict()
     finally:
         session.close()
 
-def delete_expense(expense_id):
-    """Delete an expense from the database."""
+def _apply_expense_filters(query, filters=None):
+    """
+    Restrict an expense query using a filters dict with any of the keys
+    start_date, end_date (inclusive dates), category, min_amount and max_amount.
+    """
+    if not filters:
+        return query
+    if filters.get("start_date"):
+        query = query.filter(Expense.date >= filters["start_date"])
+    if filters.get("end_date"):
+        query = query.filter(Expense.date <= filters["end_date"])
+    if filters.get("category") and filters["category"] != "All":
+        query = query.filter(Expense.category == filters["category"])
+    if filters.get("min_amount") is not None:
+        query = query.filter(Expense.amount_cents >= to_cents(filters["min_amount"]))
+    if filters.get("max_amount") is not None:
+        query = query.filter(Expense.amount_cents <= to_cents(filters["max_amount"]))
+    return query
+
+def _period_start(period, week_start=WEEK_START):
+    """SQL expression for the first day of the period containing Expense.date."""
+    if period == "day":
+        return func.date(Expense.date)
+    elif period == "week":
+        # Go back six days, then forward to the first week-start day;
+        # SQLite numbers weekdays from Sunday = 0
+        return func.date(Expense.date, "-6 days", f"weekday {(week_start + 1) % 7}")
+    elif period == "month":
+        return func.strftime("%Y-%m-01", Expense.date)
+    elif period == "quarter":
+        months_into_quarter = (cast(func.strftime("%m", Expense.date), Integer) - 1) % 3
+        return func.date(Expense.date, "start of month", func.printf("-%d months", months_into_quarter))
+    else:  # year
+        return func.strftime("%Y-01-01", Expense.date)
+
+def _as_date(value):
+    """Accept a date or an ISO date string."""
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+def _rollup_filters(filters=None):
+    """
+    Translate expense filters into rollup filters when the monthly rollup can
+    answer them, i.e. they only select categories and whole months.
+    Returns None when the raw expenses have to be queried instead.
+    """
+    filters = filters or {}
+    if filters.get("min_amount") is not None or filters.get("max_amount") is not None:
+        return None
+    rollup_filters = {"category": filters.get("category")}
+    if filters.get("start_date"):
+        start_date = _as_date(filters["start_date"])
+        if start_date.day != 1:
+            return None
+        rollup_filters["start_month"] = start_date.strftime("%Y-%m")
+    if filters.get("end_date"):
+        end_date = _as_date(filters["end_date"])
+        if (end_date + timedelta(days=1)).day != 1:
+            return None
+        rollup_filters["end_month"] = end_date.strftime("%Y-%m")
+    return rollup_filters
+
+def _apply_rollup_filters(query, rollup_filters):
+    """Restrict a MonthlyCategoryTotal query using the output of _rollup_filters."""
+    if rollup_filters.get("start_month"):
+        query = query.filter(MonthlyCategoryTotal.month >= rollup_filters["start_month"])
+    if rollup_filters.get("end_month"):
+        query = query.filter(MonthlyCategoryTotal.month <= rollup_filters["end_month"])
+    if rollup_filters.get("category") and rollup_filters["category"] != "All":
+        query = query.filter(MonthlyCategoryTotal.category == rollup_filters["category"])
+    return query
+
+def _month_period_start(month, period):
+    """First day of the month, quarter or year containing a "YYYY-MM" month."""
+    year, month_number = month.split("-")
+    if period == "month":
+        return f"{month}-01"
+    elif period == "quarter":
+        return f"{year}-{(int(month_number) - 1) // 3 * 3 + 1:02d}-01"
+    else:  # year
+        return f"{year}-01-01"
+
+def get_expense_totals_by_category(filters=None, user_id=DEFAULT_USER_ID):
+    """Get total spending per category, grouped in the database."""
+    rollup_filters = _rollup_filters(filters)
+    session = Session()
+    try:
+        if rollup_filters is not None:
+            query = session.query(MonthlyCategoryTotal.category, func.sum(MonthlyCategoryTotal.total_cents))
+            query = _apply_rollup_filters(query.filter(MonthlyCategoryTotal.user_id == user_id), rollup_filters)
+            rows = query.group_by(MonthlyCategoryTotal.category).all()
+            return {category: from_cents(total) for category, total in rows}
+        
+        query = session.query(Expense.category, func.sum(Expense.amount_cents)).filter(Expense.user_id == user_id)
+        query = _apply_expense_filters(query, filters)
+        rows = query.group_by(Expense.category).all()
+        return {category: from_cents(total) for category, total in rows}
+    finally:
+        session.close()
+
+def get_expense_totals_by_period(period="month", filters=None, user_id=DEFAULT_USER_ID, week_start=WEEK_START):
+    """Get total spending per day, week, month, quarter or year, keyed by the period start date."""
+    rollup_filters = _rollup_filters(filters) if period in ("month", "quarter", "year") else None
+    session = Session()
+    try:
+        if rollup_filters is not None:
+            query = session.query(MonthlyCategoryTotal.month, func.sum(MonthlyCategoryTotal.total_cents))
+            query = _apply_rollup_filters(query.filter(MonthlyCategoryTotal.user_id == user_id), rollup_filters)
+            totals = {}
+            for month, total in query.group_by(MonthlyCategoryTotal.month).order_by(MonthlyCategoryTotal.month):
+                period_start = _month_period_start(month, period)
+                totals[period_start] = totals.get(period_start, 0) + total
+            return {period_start: from_cents(total) for period_start, total in totals.items()}
+        
+        bucket = _period_start(period, week_start).label("period")
+        query = session.query(bucket, func.sum(Expense.amount_cents)).filter(Expense.user_id == user_id)
+        query = _apply_expense_filters(query, filters)
+        rows = query.group_by(bucket).order_by(bucket).all()
+        return {str(period_start): from_cents(total) for period_start, total in rows}
+    finally:
+        session.close()
+
+def get_monthly_category_totals(filters=None, user_id=DEFAULT_USER_ID):
+    """Get total spending per month and category as {"YYYY-MM": {category: total}}."""
+    rollup_filters = _rollup_filters(filters)
+    session = Session()
+    try:
+        if rollup_filters is not None:
+            query = session.query(MonthlyCategoryTotal.month, MonthlyCategoryTotal.category, MonthlyCategoryTotal.total_cents)
+            query = _apply_rollup_filters(query.filter(MonthlyCategoryTotal.user_id == user_id), rollup_filters)
+            result = {}
+            for month_key, category, total in query.order_by(MonthlyCategoryTotal.month):
+                result.setdefault(month_key, {})[category] = from_cents(total)
+            return result
+        
+        month = func.strftime("%Y-%m", Expense.date).label("month")
+        query = session.query(month, Expense.category, func.sum(Expense.amount_cents)).filter(Expense.user_id == user_id)
+        query = _apply_expense_filters(query, filters)
+        rows = query.group_by(month, Expense.category).order_by(month).all()
+        result = {}
+        for month_key, category, total in rows:
+            result.setdefault(month_key, {})[category] = from_cents(total)
+        return result
+    finally:
+        session.close()
+
+def get_expenses_page(filters=None, after_cursor=None, limit=10, user_id=DEFAULT_USER_ID):
+    """
+    Get one page of expenses, newest first, using keyset pagination on (date, id).
+    
+    Pass the returned next_cursor as after_cursor to fetch the following page.
+    Returns a dict with the page's expenses, the next cursor (None on the last
+    page) and the total count and amount of all expenses matching the filters.
+    """
+    session = Session()
+    try:
+        query = _apply_expense_filters(session.query(Expense).filter(Expense.user_id == user_id), filters)
+        
+        if after_cursor:
+            cursor_date, cursor_id = after_cursor
+            cursor_date = datetime.strptime(cursor_date, "%Y-%m-%d").date()
+            query = query.filter(or_(
+                Expense.date < cursor_date,
+                and_(Expense.date == cursor_date, Expense.id < cursor_id)
+            ))
+        
+        # Fetch one extra row to know whether another page follows
+        rows = query.order_by(Expense.date.desc(), Expense.id.desc()).limit(limit + 1).all()
+        expenses = [expense.to_dict() for expense in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            next_cursor = (expenses[-1]["date"], expenses[-1]["id"])
+        
+        summary_query = session.query(func.count(Expense.id), func.sum(Expense.amount_cents)).filter(Expense.user_id == user_id)
+        total_count, total_cents = _apply_expense_filters(summary_query, filters).one()
+        
+        return {
+            "expenses": expenses,
+            "next_cursor": next_cursor,
+            "total_count": total_count,
+            "total_amount": from_cents(total_cents)
+        }
+    finally:
+        session.close()
+
+def get_expense_columns(filters=None, user_id=DEFAULT_USER_ID):
+    """
+    Get a user's expenses as typed NumPy columns, ordered by date.
+    
+    Returns a dict with int64 "id" and "amount_cents" arrays, a datetime64[D]
+    "date" array and object arrays for "category" and "description", so
+    analytics code can work on integer cents without parsing to_dict() strings.
+    """
+    table = Expense.__table__
+    statement = select(
+        table.c.id,
+        # Read the ISO date text as-is; NumPy parses it faster than per-row date objects
+        type_coerce(table.c.date, String).label("date"),
+        table.c.amount_cents,
+        table.c.category,
+        table.c.description
+    ).where(table.c.user_id == user_id)
+    statement = _apply_expense_filters(statement, filters).order_by(table.c.date, table.c.id)
+    
+    with engine.connect() as connection:
+        rows = connection.execute(statement).all()
+    
+    ids, dates, amounts, categories, descriptions = zip(*rows) if rows else ((), (), (), (), ())
+    return {
+        "id": np.array(ids, dtype=np.int64),
+        "date": np.array(dates, dtype="datetime64[D]"),
+        "amount_cents": np.array(amounts, dtype=np.int64),
+        "category": np.array(categories, dtype=object),
+        "description": np.array(descriptions, dtype=object)
+    }
+
+def delete_expense(expense_id, user_id=DEFAULT_USER_ID):
+    """Delete one of a user's expenses from the database."""
     session = Session()
     try:
-        expense = session.query(Expense).filter(Expense.id == expense_id).first()
+        expense = session.query(Expense).filter(Expense.id == expense_id, Expense.user_id == user_id).first()
         if expense:
+            _apply_rollup_deltas(session.connection(), user_id, {
+                (expense.date.strftime("%Y-%m"), expense.category): (-expense.amount_cents, -1)
+            })
             session.delete(expense)
             session.commit()
+            _bump_expense_reset(user_id)
             return True
         return False
     finally:
         session.close()
 
-def get_all_budgets():
-    """Get all budgets from the database."""
+def get_all_budgets(user_id=DEFAULT_USER_ID):
+    """Get all of a user's budgets from the database."""
     session = Session()
     try:
-        budgets = session.query(Budget).all()
+        budgets = session.query(Budget).filter(Budget.user_id == user_id).all()
         return {budget.category: str(budget.amount) for budget in budgets}
     finally:
         session.close()
 
-def save_budget(category, amount):
+def save_budget(category, amount, user_id=DEFAULT_USER_ID):
     """Save or update a budget."""
     session = Session()
     try:
-        budget = session.query(Budget).filter(Budget.category == category).first()
+        budget = session.query(Budget).filter(Budget.user_id == user_id, Budget.category == category).first()
         if budget:
             budget.amount = amount
         else:
-            budget = Budget(category=category, amount=amount)
+            budget = Budget(user_id=user_id, category=category, amount=amount)
             session.add(budget)
         session.commit()
         return True
     finally:
         session.close()
 
-def save_budgets(budgets_dict):
+def save_budgets(budgets_dict, user_id=DEFAULT_USER_ID):
     """Save multiple budgets at once."""
     session = Session()
     try:
         # Clear existing budgets
-        session.query(Budget).delete()
+        session.query(Budget).filter(Budget.user_id == user_id).delete()
         
         # Add new budgets
         for category, amount in budgets_dict.items():
-            budget = Budget(category=category, amount=float(amount))
+            budget = Budget(user_id=user_id, category=category, amount=float(amount))
             session.add(budget)
         
         session.commit()
@@ -192,31 +836,31 @@ def save_budgets(budgets_dict):
     finally:
         session.close()
 
-def get_all_goals():
-    """Get all financial goals from the database."""
+def get_all_goals(user_id=DEFAULT_USER_ID):
+    """Get all of a user's financial goals from the database."""
     session = Session()
     try:
-        goals = session.query(Goal).all()
+        goals = session.query(Goal).filter(Goal.user_id == user_id).all()
         return [goal.to_dict() for goal in goals]
     finally:
         session.close()
 
-def add_goal(goal_data):
+def add_goal(goal_data, user_id=DEFAULT_USER_ID):
     """Add a new financial goal to the database."""
     session = Session()
     try:
-        goal = Goal.from_dict(goal_data)
+        goal = Goal.from_dict(goal_data, user_id)
         session.add(goal)
         session.commit()
         return goal.to_dict()
     finally:
         session.close()
 
-def update_goal(goal_id, goal_data):
+def update_goal(goal_id, goal_data, user_id=DEFAULT_USER_ID):
     """Update an existing financial goal."""
     session = Session()
     try:
-        goal = session.query(Goal).filter(Goal.id == goal_id).first()
+        goal = session.query(Goal).filter(Goal.id == goal_id, Goal.user_id == user_id).first()
         if goal:
             goal.name = goal_data.get("name", goal.name)
             goal.target_amount = float(goal_data.get("target_amount", goal.target_amount))
@@ -231,11 +875,11 @@ def update_goal(goal_id, goal_data):
     finally:
         session.close()
 
-def delete_goal(goal_id):
+def delete_goal(goal_id, user_id=DEFAULT_USER_ID):
     """Delete a financial goal."""
     session = Session()
     try:
-        goal = session.query(Goal).filter(Goal.id == goal_id).first()
+        goal = session.query(Goal).filter(Goal.id == goal_id, Goal.user_id == user_id).first()
         if goal:
             session.delete(goal)
             session.commit()
@@ -244,16 +888,16 @@ def delete_goal(goal_id):
     finally:
         session.close()
 
-def save_insights(insights):
+def save_insights(insights, user_id=DEFAULT_USER_ID):
     """Save financial insights to the database."""
     session = Session()
     try:
         # Clear old insights
-        session.query(Insight).delete()
+        session.query(Insight).filter(Insight.user_id == user_id).delete()
         
         # Add new insights
         for insight in insights:
-            new_insight = Insight(content=insight)
+            new_insight = Insight(user_id=user_id, content=insight)
             session.add(new_insight)
         
         session.commit()
@@ -261,55 +905,356 @@ def save_insights(insights):
     finally:
         session.close()
 
-def get_insights():
-    """Get all financial insights from the database."""
+def get_insights(user_id=DEFAULT_USER_ID):
+    """Get all of a user's financial insights from the database."""
     session = Session()
     try:
-        insights = session.query(Insight).all()
+        insights = session.query(Insight).filter(Insight.user_id == user_id).all()
         return [insight.content for insight in insights]
     finally:
         session.close()
 
+# Categorization cache functions
+def get_cached_category(description_key, ttl_days=CATEGORY_CACHE_TTL_DAYS, touch_interval=CATEGORY_CACHE_TOUCH_INTERVAL_SECONDS):
+    """
+    Get the cached category for a normalized description, or None on a miss.
+    Entries older than ttl_days are treated as missing.
+    
+    The entry's last_used_at and hit_count are only updated when it was last
+    touched more than touch_interval seconds ago. Eviction needs no finer
+    recency than that, and it keeps most hits from taking SQLite's write lock.
+    """
+    now = datetime.now()
+    # Same text format SQLAlchemy uses for DateTime columns in SQLite
+    timestamp_format = "%Y-%m-%d %H:%M:%S.%f"
+    with engine.connect() as connection:
+        row = connection.exec_driver_sql(
+            "SELECT category, last_used_at FROM category_cache WHERE description_key = ? AND created_at >= ?",
+            (description_key, (now - timedelta(days=ttl_days)).strftime(timestamp_format))
+        ).first()
+    if row is None:
+        return None
+    
+    touch_before = (now - timedelta(seconds=touch_interval)).strftime(timestamp_format)
+    if row.last_used_at < touch_before:
+        # The condition is repeated so concurrent hits on the same entry touch it only once
+        with engine.begin() as connection:
+            connection.exec_driver_sql(
+                "UPDATE category_cache SET last_used_at = ?, hit_count = hit_count + 1 "
+                "WHERE description_key = ? AND last_used_at < ?",
+                (now.strftime(timestamp_format), description_key, touch_before)
+            )
+    return row.category
+
+def save_cached_category(description_key, category, max_entries=CATEGORY_CACHE_MAX_ENTRIES):
+    """Cache the category for a normalized description, evicting the least recently used entries over max_entries."""
+    session = Session()
+    try:
+        now = datetime.now()
+        # A single upsert, so concurrent saves of the same description cannot collide
+        session.execute(
+            sqlite_insert(CategoryCacheEntry)
+            .values(description_key=description_key, category=category, created_at=now, last_used_at=now, hit_count=0)
+            .on_conflict_do_update(
+                index_elements=[CategoryCacheEntry.description_key],
+                set_={"category": category, "created_at": now, "last_used_at": now}
+            )
+        )
+        
+        excess = session.query(func.count(CategoryCacheEntry.description_key)).scalar() - max_entries
+        if excess > 0:
+            oldest = session.query(CategoryCacheEntry.description_key).order_by(CategoryCacheEntry.last_used_at).limit(excess)
+            session.query(CategoryCacheEntry).filter(
+                CategoryCacheEntry.description_key.in_(oldest.scalar_subquery())
+            ).delete(synchronize_session=False)
+        session.commit()
+    finally:
+        session.close()
+
+# Memoized AI result functions
+def get_llm_result(kind, fingerprint, user_id=DEFAULT_USER_ID):
+    """Get a user's stored AI result of a kind if it was generated from the same input fingerprint, else None."""
+    session = Session()
+    try:
+        entry = session.get(LLMResult, (user_id, kind))
+        if entry is None or entry.fingerprint != fingerprint:
+            return None
+        return entry.result
+    finally:
+        session.close()
+
+def save_llm_result(kind, fingerprint, result, user_id=DEFAULT_USER_ID):
+    """Store a user's latest AI result of a kind, replacing the previous one."""
+    session = Session()
+    try:
+        now = datetime.now()
+        session.execute(
+            sqlite_insert(LLMResult)
+            .values(user_id=user_id, kind=kind, fingerprint=fingerprint, result=result, created_at=now)
+            .on_conflict_do_update(
+                index_elements=[LLMResult.user_id, LLMResult.kind],
+                set_={"fingerprint": fingerprint, "result": result, "created_at": now}
+            )
+        )
+        session.commit()
+    finally:
+        session.close()
+
 # Import/export functions
-def export_data():
-    """Export all data to a dictionary."""
+def export_data(user_id=DEFAULT_USER_ID):
+    """Export all of a user's data to a dictionary."""
     return {
-        "expenses": get_all_expenses(),
-        "budgets": get_all_budgets(),
-        "goals": get_all_goals(),
-        "insights": get_insights()
+        "expenses": get_all_expenses(user_id),
+        "budgets": get_all_budgets(user_id),
+        "goals": get_all_goals(user_id),
+        "insights": get_insights(user_id)
     }
 
-def import_data(data):
-    """Import data from a dictionary."""
+def iter_export_json(chunk_size=EXPORT_CHUNK_SIZE, user_id=DEFAULT_USER_ID):
+    """
+    Yield the export as JSON text fragments.
+    
+    Expenses are streamed from the database chunk_size rows at a time, so
+    memory use stays flat no matter how many expenses there are. The output
+    has the same structure as export_data().
+    """
     session = Session()
     try:
-        # Clear existing data
-        session.query(Expense).delete()
-        session.query(Budget).delete()
-        session.query(Goal).delete()
-        session.query(Insight).delete()
+        yield '{\n  "expenses": ['
+        separator = "\n    "
+        expenses = session.query(Expense).filter(Expense.user_id == user_id).order_by(Expense.id)
+        for expense in expenses.yield_per(chunk_size):
+            yield separator + json.dumps(expense.to_dict())
+            separator = ",\n    "
+        yield "\n  ],\n"
+    finally:
+        session.close()
+    
+    # Budgets, goals and insights are small enough to serialize in one go
+    yield '  "budgets": ' + json.dumps(get_all_budgets(user_id)) + ",\n"
+    yield '  "goals": ' + json.dumps(get_all_goals(user_id)) + ",\n"
+    yield '  "insights": ' + json.dumps(get_insights(user_id)) + "\n}\n"
+
+def write_export_json(file_obj, chunk_size=EXPORT_CHUNK_SIZE, user_id=DEFAULT_USER_ID):
+    """Write the JSON export to a binary file object without building it in memory."""
+    for fragment in iter_export_json(chunk_size, user_id):
+        file_obj.write(fragment.encode("utf-8"))
+
+def _expense_row(expense_data, user_id=DEFAULT_USER_ID):
+    """Convert an expense dict into a parameter tuple for the raw expense insert."""
+    return (
+        user_id,
+        expense_data["description"],
+        to_cents(expense_data["amount"]),
+        # Validate the date and store it in the same ISO format as the Date column
+        date.fromisoformat(expense_data["date"]).isoformat(),
+        expense_data["category"]
+    )
+
+def _goal_row(goal_data, user_id=DEFAULT_USER_ID):
+    """Convert a goal dict into a column dict for bulk inserts."""
+    goal = Goal.from_dict(goal_data, user_id)
+    return {column.name: getattr(goal, column.name) for column in Goal.__table__.columns if column.name != "id"}
+
+def _chunked(rows, chunk_size):
+    """Yield lists of up to chunk_size rows from an iterable."""
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def _bulk_insert(connection, table, rows, chunk_size=BULK_INSERT_CHUNK_SIZE):
+    """Insert column dicts with one executemany per chunk and return the number inserted."""
+    count = 0
+    for chunk in _chunked(rows, chunk_size):
+        connection.execute(table.insert(), chunk)
+        count += len(chunk)
+    return count
+
+def _bulk_insert_expenses(connection, expenses, user_id=DEFAULT_USER_ID, chunk_size=BULK_INSERT_CHUNK_SIZE, defer_indexes=False):
+    """Bulk insert expense dicts on an open connection, optionally rebuilding the indexes afterwards."""
+    indexes = list(Expense.__table__.indexes)
+    if defer_indexes:
+        for index in indexes:
+            index.drop(bind=connection, checkfirst=True)
+    
+    # Expenses can number in the hundreds of thousands, so skip SQLAlchemy's
+    # per-row parameter processing and hand tuples straight to the driver
+    count = 0
+    rollup_deltas = {}
+    for chunk in _chunked((_expense_row(e, user_id) for e in expenses), chunk_size):
+        connection.exec_driver_sql(EXPENSE_INSERT_SQL, chunk)
+        for _, _, amount_cents, date_text, category in chunk:
+            _add_rollup_delta(rollup_deltas, date_text[:7], category, amount_cents)
+        count += len(chunk)
+    _apply_rollup_deltas(connection, user_id, rollup_deltas)
+    
+    if defer_indexes:
+        for index in indexes:
+            index.create(bind=connection, checkfirst=True)
+    return count
+
+def bulk_insert_expenses(expenses, user_id=DEFAULT_USER_ID, chunk_size=BULK_INSERT_CHUNK_SIZE, defer_indexes=False):
+    """
+    Insert many expenses for a user in a single transaction.
+    
+    Rows are sent in chunks of chunk_size with executemany. With defer_indexes
+    the expense indexes are dropped for the load and rebuilt once at the end,
+    which is faster for very large loads into a table that is mostly empty.
+    """
+    with engine.begin() as connection:
+        count = _bulk_insert_expenses(connection, expenses, user_id, chunk_size, defer_indexes)
+    _bump_expense_version(user_id)
+    return count
+
+def import_data(data, user_id=DEFAULT_USER_ID, defer_indexes=None):
+    """
+    Replace a user's data with the contents of a dictionary.
+    
+    By default the expense indexes are only deferred when no other user has
+    expenses, since rebuilding them costs time proportional to the whole table.
+    """
+    with engine.begin() as connection:
+        # Clear the user's existing data
+        for table in (Expense.__table__, MonthlyCategoryTotal.__table__, Budget.__table__, Goal.__table__, Insight.__table__):
+            connection.execute(table.delete().where(table.c.user_id == user_id))
+        
+        if defer_indexes is None:
+            defer_indexes = connection.execute(Expense.__table__.select().limit(1)).first() is None
         
         # Import expenses
-        for expense_data in data.get("expenses", []):
-            session.add(Expense.from_dict(expense_data))
+        _bulk_insert_expenses(connection, data.get("expenses", []), user_id, defer_indexes=defer_indexes)
         
         # Import budgets
-        for category, amount in data.get("budgets", {}).items():
-            session.add(Budget(category=category, amount=float(amount)))
+        _bulk_insert(connection, Budget.__table__, (
+            {"user_id": user_id, "category": category, "amount": float(amount)}
+            for category, amount in data.get("budgets", {}).items()
+        ))
         
         # Import goals
-        for goal_data in data.get("goals", []):
-            session.add(Goal.from_dict(goal_data))
+        _bulk_insert(connection, Goal.__table__, (_goal_row(goal_data, user_id) for goal_data in data.get("goals", [])))
         
         # Import insights
-        for insight in data.get("insights", []):
-            session.add(Insight(content=insight))
-        
-        session.commit()
-        return True
-    except Exception as e:
-        session.rollback()
-        raise e
-    finally:
-        session.close()
\ No newline at end of file
+        _bulk_insert(connection, Insight.__table__, (
+            {"user_id": user_id, "content": insight} for insight in data.get("insights", [])
+        ))
+    
+    _bump_expense_reset(user_id)
+    return True
+
+def _merge_expense(connection, expense_data, user_id, seen_keys, rollup_deltas):
+    """
+    Insert an imported expense unless the database already holds this
+    occurrence of it, updating the stored category if the import gives a
+    different one.
+    """
+    user_id, description, amount_cents, date_text, category = _expense_row(expense_data, user_id)
+    # Category is not part of the natural key, since an uncategorized file is
+    # categorized anew on every import. Identical expenses are matched by
+    # occurrence: the nth copy in the file maps to the nth copy in the database
+    key = (description, amount_cents, date_text)
+    occurrence = seen_keys.get(key, 0)
+    seen_keys[key] = occurrence + 1
+    existing = connection.exec_driver_sql(
+        EXPENSE_KEY_MATCH_SQL, (user_id, description, amount_cents, date_text, occurrence)
+    ).first()
+    if existing is None:
+        connection.exec_driver_sql(EXPENSE_INSERT_SQL, (user_id, description, amount_cents, date_text, category))
+        _add_rollup_delta(rollup_deltas, date_text[:7], category, amount_cents)
+        return "inserted"
+    # A guessed category never overrides the stored one, which the user may have corrected
+    if existing.category == category or expense_data.get("category_guessed"):
+        return "skipped"
+    connection.exec_driver_sql("UPDATE expenses SET category = ? WHERE id = ?", (category, existing.id))
+    _add_rollup_delta(rollup_deltas, date_text[:7], existing.category, -amount_cents, -1)
+    _add_rollup_delta(rollup_deltas, date_text[:7], category, amount_cents)
+    return "updated"
+
+def _merge_budget(connection, user_id, category, amount):
+    """Insert or update an imported budget keyed by category."""
+    table = Budget.__table__
+    amount = float(amount)
+    existing = connection.execute(
+        table.select().where(table.c.user_id == user_id, table.c.category == category)
+    ).mappings().first()
+    if existing is None:
+        connection.execute(table.insert().values(user_id=user_id, category=category, amount=amount))
+        return "inserted"
+    if existing["amount"] == amount:
+        return "skipped"
+    connection.execute(table.update().where(table.c.id == existing["id"]).values(amount=amount))
+    return "updated"
+
+def _merge_goal(connection, user_id, goal_data):
+    """Insert or update an imported goal keyed by name."""
+    table = Goal.__table__
+    row = _goal_row(goal_data, user_id)
+    if "created_date" not in goal_data:
+        # Keep the stored creation date rather than resetting it to today
+        row.pop("created_date")
+    existing = connection.execute(
+        table.select().where(table.c.user_id == user_id, table.c.name == row["name"])
+    ).mappings().first()
+    if existing is None:
+        connection.execute(table.insert().values(**row))
+        return "inserted"
+    if all(existing[key] == value for key, value in row.items()):
+        return "skipped"
+    connection.execute(table.update().where(table.c.id == existing["id"]).values(**row))
+    return "updated"
+
+def _merge_insight(connection, user_id, content):
+    """Insert an imported insight unless the same text is already stored."""
+    table = Insight.__table__
+    existing = connection.execute(
+        table.select().where(table.c.user_id == user_id, table.c.content == content)
+    ).first()
+    if existing is not None:
+        return "skipped"
+    connection.execute(table.insert().values(user_id=user_id, content=content))
+    return "inserted"
+
+def merge_import(records, user_id=DEFAULT_USER_ID, chunk_size=BULK_INSERT_CHUNK_SIZE):
+    """
+    Upsert imported (section, item) records, e.g. from utils.import_utils.iter_import_records.
+    
+    Unlike import_data this keeps existing data: expenses are matched on
+    (date, description, amount) with category as an updatable field, budgets
+    on category, goals on name and insights on their text. Only rows that are new or changed are
+    written, in one transaction per chunk_size records. Records are read
+    between transactions, so a slow record source (such as one that calls
+    the categorization API) never holds the database write lock. Returns the
+    inserted, updated and skipped row counts.
+    """
+    counts = {"inserted": 0, "updated": 0, "skipped": 0}
+    seen_expense_keys = {}
+    expenses_recategorized = False
+    
+    for chunk in _chunked(records, chunk_size):
+        rollup_deltas = {}
+        with engine.begin() as connection:
+            for section, item in chunk:
+                if section == "expenses":
+                    outcome = _merge_expense(connection, item, user_id, seen_expense_keys, rollup_deltas)
+                    expenses_recategorized = expenses_recategorized or outcome == "updated"
+                elif section == "budgets":
+                    outcome = _merge_budget(connection, user_id, *item)
+                elif section == "goals":
+                    outcome = _merge_goal(connection, user_id, item)
+                elif section == "insights":
+                    outcome = _merge_insight(connection, user_id, item)
+                else:
+                    continue
+                counts[outcome] += 1
+            _apply_rollup_deltas(connection, user_id, rollup_deltas)
+    
+    if expenses_recategorized:
+        # Existing expenses changed category, so the local categorizer has to retrain
+        _bump_expense_reset(user_id)
+    else:
+        _bump_expense_version(user_id)
+    return counts
@@ -0,0 +1,179 @@
+"""Incremental parsers for imported finance data files."""
+
+import io
+import csv
+import json
+
+# Characters read from the upload per refill of the JSON parse buffer
+JSON_READ_SIZE = 64 * 1024
+
+# Uncategorized imported expenses collected before each categorization call
+CATEGORIZE_CHUNK_SIZE = 500
+
+class _JsonStreamReader:
+    """
+    Minimal pull parser over a text stream.
+    
+    Only the surrounding structure of the export is walked by hand; each value
+    inside it is decoded with json's raw_decode, so at most one value plus one
+    read block is held in memory at a time.
+    """
+    
+    def __init__(self, text_stream, read_size=JSON_READ_SIZE):
+        self.text_stream = text_stream
+        self.read_size = read_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+    
+    def _fill(self):
+        """Read another block into the buffer; return False at end of input."""
+        if self.eof:
+            return False
+        chunk = self.text_stream.read(self.read_size)
+        if not chunk:
+            self.eof = True
+            return False
+        # Drop the consumed prefix so the buffer does not grow with the file
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+    
+    def peek(self):
+        """Return the next non-whitespace character without consuming it."""
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos] in " \t\r\n":
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self._fill():
+                raise ValueError("Unexpected end of JSON data")
+    
+    def expect(self, *chars):
+        """Consume the next character, which must be one of chars, and return it."""
+        char = self.peek()
+        if char not in chars:
+            raise ValueError(f"Expected one of {chars!r} in JSON data, found {char!r}")
+        self.pos += 1
+        return char
+    
+    def _may_be_truncated(self, value, end):
+        """Return True if a decoded number could still have more digits to come."""
+        if not isinstance(value, (int, float)) or isinstance(value, bool):
+            return False
+        return end == len(self.buffer) or self.buffer[end] in "0123456789.eE+-"
+    
+    def decode_value(self):
+        """Decode the next complete JSON value."""
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self._fill():
+                    raise
+                continue
+            # A number cut off by the end of the buffer may continue in the next block
+            if self._may_be_truncated(value, end) and self._fill():
+                continue
+            self.pos = end
+            return value
+
+def iter_json_records(text_stream, read_size=JSON_READ_SIZE):
+    """
+    Yield (section, item) pairs from a JSON export one item at a time.
+    
+    Array sections such as "expenses" yield each element; object sections
+    such as "budgets" yield (key, value) pairs.
+    """
+    reader = _JsonStreamReader(text_stream, read_size)
+    reader.expect("{")
+    if reader.peek() == "}":
+        return
+    
+    while True:
+        section = reader.decode_value()
+        reader.expect(":")
+        
+        if reader.peek() == "[":
+            reader.expect("[")
+            if reader.peek() == "]":
+                reader.expect("]")
+            else:
+                while True:
+                    yield section, reader.decode_value()
+                    if reader.expect(",", "]") == "]":
+                        break
+        elif reader.peek() == "{":
+            reader.expect("{")
+            if reader.peek() == "}":
+                reader.expect("}")
+            else:
+                while True:
+                    key = reader.decode_value()
+                    reader.expect(":")
+                    yield section, (key, reader.decode_value())
+                    if reader.expect(",", "}") == "}":
+                        break
+        else:
+            # Ignore unknown scalar sections
+            reader.decode_value()
+        
+        if reader.expect(",", "}") == "}":
+            return
+
+def iter_csv_records(text_stream):
+    """
+    Yield ("expenses", row) pairs from a CSV file with date, description,
+    amount and optional category columns.
+    """
+    for row in csv.DictReader(text_stream):
+        yield "expenses", {
+            "date": row["date"].strip(),
+            "description": row["description"].strip(),
+            "amount": row["amount"].strip(),
+            "category": (row.get("category") or "").strip()
+        }
+
+def iter_import_records(uploaded_file, file_name=None):
+    """
+    Yield (section, item) records from an uploaded JSON or CSV file
+    without loading the whole file into memory.
+    """
+    file_name = file_name or getattr(uploaded_file, "name", "")
+    text_stream = io.TextIOWrapper(uploaded_file, encoding="utf-8", newline="")
+    if file_name.lower().endswith(".csv"):
+        return iter_csv_records(text_stream)
+    return iter_json_records(text_stream)
+
+def fill_missing_categories(records, categorize_batch, chunk_size=CATEGORIZE_CHUNK_SIZE):
+    """
+    Pass (section, item) records through, filling in the category of expenses
+    that have none.
+    
+    Uncategorized expenses are held back and categorized chunk_size at a time
+    with categorize_batch, e.g. utils.openai_utils.categorize_expenses_batch,
+    so a large bank export needs one call per chunk rather than per row.
+    """
+    pending = []
+    for section, item in records:
+        if section == "expenses" and not item.get("category"):
+            pending.append(item)
+            if len(pending) >= chunk_size:
+                yield from _categorized(pending, categorize_batch)
+                pending = []
+        else:
+            yield section, item
+    if pending:
+        yield from _categorized(pending, categorize_batch)
+
+def _categorized(expenses, categorize_batch):
+    """
+    Yield ("expenses", item) records with categories assigned by
+    categorize_batch, marked as guessed so they do not override stored ones.
+    """
+    for item, category in zip(expenses, categorize_batch(expenses)):
+        item["category"] = category
+        item["category_guessed"] = True
+        yield "expenses", item
@@ -0,0 +1,113 @@
+"""Background generation of AI insights and saving recommendations."""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from utils.database import DEFAULT_USER_ID, get_all_expenses, get_all_budgets, save_insights
+from utils.openai_utils import analyze_spending_patterns, get_saving_recommendations
+
+logger = logging.getLogger(__name__)
+
+# Worker threads shared by every session in the process
+INSIGHT_WORKERS = 2
+
+_executor = ThreadPoolExecutor(max_workers=INSIGHT_WORKERS, thread_name_prefix="insights")
+_jobs = {}
+_jobs_lock = threading.Lock()
+
+def _new_job_state():
+    return {
+        "running": False,
+        # Set when another request arrives while a job runs, so it runs once more on the newest data
+        "rerun": False,
+        # Set when a queued run should ignore stored results and call the model again
+        "force": False,
+        # Insights already generated for the queued run (e.g. streamed on the page), so only recommendations are made
+        "given_insights": None,
+        # Budgets from the requesting session, which may not have been saved to the database
+        "given_budgets": None,
+        "completed": 0,
+        "finished_at": None,
+        "insights": None,
+        "recommendations": None,
+        "error": None
+    }
+
+def _generate(user_id, force=False, insights=None, budgets=None):
+    """
+    Generate and store a user's insights and recommendations from their
+    current data, reusing insights when they are given. Budgets are read
+    from the database unless given.
+    """
+    expenses = get_all_expenses(user_id)
+    if budgets is None:
+        budgets = get_all_budgets(user_id)
+    
+    if insights is None:
+        insights = analyze_spending_patterns(expenses, user_id, force)
+    save_insights(insights, user_id)
+    
+    if budgets:
+        recommendations = get_saving_recommendations(expenses, budgets, user_id, force)
+    else:
+        recommendations = ["Set up budgets to receive personalized saving recommendations."]
+    return insights, recommendations
+
+def _run_job(user_id):
+    while True:
+        with _jobs_lock:
+            job = _jobs[user_id]
+            force, given_insights, given_budgets = job["force"], job["given_insights"], job["given_budgets"]
+            job["force"], job["given_insights"] = False, None
+        try:
+            insights, recommendations = _generate(user_id, force, given_insights, given_budgets)
+            error = None
+        except Exception as e:
+            logger.error(f"Error generating insights for {user_id}: {e}")
+            insights, recommendations, error = None, None, str(e)
+        
+        with _jobs_lock:
+            job = _jobs[user_id]
+            if error is None:
+                job["insights"] = insights
+                job["recommendations"] = recommendations
+            job["error"] = error
+            job["completed"] += 1
+            job["finished_at"] = datetime.now()
+            if not job["rerun"]:
+                job["running"] = False
+                return
+            job["rerun"] = False
+
+def submit_insight_job(user_id=DEFAULT_USER_ID, force=False, insights=None, budgets=None):
+    """
+    Queue insight and recommendation generation for a user and return immediately.
+    
+    Jobs are de-duplicated per user: while one is running, further requests
+    only make it run once more afterwards on the newest data. Unchanged data
+    reuses stored results unless force is set. Pass insights that were
+    already generated to only generate the recommendations, and the
+    session's budgets, which the Budget page does not save to the database.
+    """
+    with _jobs_lock:
+        job = _jobs.setdefault(user_id, _new_job_state())
+        job["force"] = job["force"] or force
+        # The latest request decides whether the queued run regenerates insights
+        job["given_insights"] = insights
+        if budgets is not None:
+            job["given_budgets"] = dict(budgets)
+        if job["running"]:
+            job["rerun"] = True
+            return
+        job["running"] = True
+    _executor.submit(_run_job, user_id)
+
+def get_insight_job(user_id=DEFAULT_USER_ID):
+    """
+    Get a snapshot of a user's background insight job: whether it is running,
+    how many runs have completed, and the latest insights and recommendations.
+    """
+    with _jobs_lock:
+        return dict(_jobs.get(user_id) or _new_job_state())
@@ -0,0 +1,234 @@
+"""Deadlines, retries and a circuit breaker for calls to the AI API."""
+
+import os
+import random
+import threading
+import time
+import logging
+
+import openai
+
+logger = logging.getLogger(__name__)
+
+# Timeout of a single request attempt, in seconds
+LLM_ATTEMPT_TIMEOUT = float(os.environ.get("FINANCE_LLM_ATTEMPT_TIMEOUT", "15"))
+# Default time budget of a call including all retries and backoff, in seconds
+LLM_DEADLINE = float(os.environ.get("FINANCE_LLM_DEADLINE", "30"))
+# Retries after the first attempt, while the deadline allows
+LLM_MAX_RETRIES = int(os.environ.get("FINANCE_LLM_MAX_RETRIES", "3"))
+# Exponential backoff: the first retry waits up to LLM_BACKOFF_BASE seconds, doubling up to LLM_BACKOFF_CAP
+LLM_BACKOFF_BASE = 0.5
+LLM_BACKOFF_CAP = 8.0
+# Consecutive failed calls that open the circuit, and how long it stays open
+LLM_BREAKER_THRESHOLD = int(os.environ.get("FINANCE_LLM_BREAKER_THRESHOLD", "5"))
+LLM_BREAKER_COOLDOWN = float(os.environ.get("FINANCE_LLM_BREAKER_COOLDOWN", "30"))
+
+# Errors worth retrying: the request may succeed if sent again
+RETRYABLE_ERRORS = (
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError
+)
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the API while the circuit breaker is open."""
+
+class CircuitBreaker:
+    """
+    Stop calling an unhealthy API for a while.
+    
+    After failure_threshold consecutive failures the circuit opens and calls
+    are refused for cooldown seconds. Then one trial call is let through
+    (half-open): success closes the circuit, failure opens it again.
+    """
+    
+    def __init__(self, failure_threshold=LLM_BREAKER_THRESHOLD, cooldown=LLM_BREAKER_COOLDOWN):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self._lock = threading.Lock()
+    
+    @property
+    def state(self):
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            if time.monotonic() - self.opened_at < self.cooldown:
+                return "open"
+            return "half-open"
+    
+    def allow(self):
+        """Whether a call may be made now; in half-open state only one trial call is allowed."""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.cooldown or self.trial_running:
+                return False
+            self.trial_running = True
+            return True
+    
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+    
+    def release_trial(self):
+        """End a half-open trial call without a verdict on the API's health, so another trial may run."""
+        with self._lock:
+            self.trial_running = False
+    
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.trial_running or self.failures >= self.failure_threshold:
+                if self.opened_at is None or self.trial_running:
+                    logger.warning(f"AI API failing, pausing calls for {self.cooldown:.0f}s")
+                self.opened_at = time.monotonic()
+            self.trial_running = False
+
+def _new_endpoint_stats():
+    return {
+        "calls": 0,
+        "successes": 0,
+        "failures": 0,
+        "retries": 0,
+        "timeouts": 0,
+        "short_circuited": 0,
+        "total_latency": 0.0,
+        "max_latency": 0.0
+    }
+
+class ResilientCaller:
+    """
+    Run API requests with a deadline, jittered exponential backoff between
+    retries and a shared circuit breaker, keeping counters per endpoint.
+    """
+    
+    def __init__(self, breaker=None, attempt_timeout=LLM_ATTEMPT_TIMEOUT, max_retries=LLM_MAX_RETRIES,
+                 backoff_base=LLM_BACKOFF_BASE, backoff_cap=LLM_BACKOFF_CAP):
+        self.breaker = breaker or CircuitBreaker()
+        self.attempt_timeout = attempt_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self._stats = {}
+        self._stats_lock = threading.Lock()
+    
+    def _count(self, endpoint, **deltas):
+        with self._stats_lock:
+            stats = self._stats.setdefault(endpoint, _new_endpoint_stats())
+            for key, delta in deltas.items():
+                stats[key] += delta
+            return stats
+    
+    def call(self, endpoint, request, deadline=LLM_DEADLINE):
+        """
+        Call request(timeout) and return its result.
+        
+        Retryable errors are retried with full-jitter backoff while attempts
+        and the deadline remain; each attempt's timeout is cut to the time
+        left. Raises CircuitOpenError without calling while the API is
+        considered unhealthy, otherwise the last error once retries run out.
+        """
+        result, started = self._attempt(endpoint, request, deadline)
+        self._finish(endpoint, started, success=True, api_healthy=True)
+        return result
+    
+    def stream(self, endpoint, request, deadline=LLM_DEADLINE):
+        """
+        Call request(timeout), which returns a stream, and yield its items.
+        
+        Opening the stream is retried like call, and the deadline also bounds
+        reading it: once it passes, APITimeoutError is raised even if items
+        are still arriving. The call is only recorded once the stream ends,
+        so an error partway through (a dropped connection, a read timeout or
+        an error event) counts as a failed call and against the circuit
+        breaker. A consumer that stops early is not a failure.
+        """
+        stream, started = self._attempt(endpoint, request, deadline)
+        expires = started + deadline
+        finished = False
+        try:
+            for item in stream:
+                if time.monotonic() > expires:
+                    response = getattr(stream, "response", None)
+                    raise openai.APITimeoutError(request=getattr(response, "request", None))
+                yield item
+        except Exception as e:
+            # The API accepted the request, so an error while reading means it or the connection failed
+            if isinstance(e, openai.APITimeoutError):
+                self._count(endpoint, timeouts=1)
+            finished = True
+            self._finish(endpoint, started, success=False, api_healthy=False)
+            raise
+        finally:
+            if not finished:
+                self._finish(endpoint, started, success=True, api_healthy=True)
+            # Release the connection if the stream was left unfinished
+            if hasattr(stream, "close"):
+                stream.close()
+    
+    def _attempt(self, endpoint, request, deadline):
+        """Run request(timeout) with retries; returns its result and the start time, or records the failure and raises."""
+        if not self.breaker.allow():
+            self._count(endpoint, short_circuited=1)
+            raise CircuitOpenError(f"AI API unavailable, skipped {endpoint} request")
+        
+        started = time.monotonic()
+        expires = started + deadline
+        attempt = 0
+        while True:
+            try:
+                return request(min(self.attempt_timeout, max(expires - time.monotonic(), 0.1))), started
+            except RETRYABLE_ERRORS as e:
+                if isinstance(e, openai.APITimeoutError):
+                    self._count(endpoint, timeouts=1)
+                delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+                if attempt < self.max_retries and time.monotonic() + delay < expires:
+                    attempt += 1
+                    self._count(endpoint, retries=1)
+                    logger.info(f"Retrying {endpoint} request in {delay:.2f}s after error: {e}")
+                    time.sleep(delay)
+                    continue
+                self._finish(endpoint, started, success=False, api_healthy=False)
+                raise
+            except openai.APIStatusError:
+                # The API answered (e.g. a rejected request), so this does not count against its health
+                self._finish(endpoint, started, success=False, api_healthy=True)
+                raise
+            except Exception:
+                # e.g. a bug in the request callable, which says nothing about the API either way
+                self._finish(endpoint, started, success=False, api_healthy=None)
+                raise
+    
+    def _finish(self, endpoint, started, success, api_healthy):
+        """Record a finished call; api_healthy=None leaves the circuit breaker's state as it was."""
+        latency = time.monotonic() - started
+        if api_healthy is None:
+            self.breaker.release_trial()
+        elif api_healthy:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+        stats = self._count(
+            endpoint, calls=1, successes=int(success), failures=int(not success), total_latency=latency
+        )
+        with self._stats_lock:
+            stats["max_latency"] = max(stats["max_latency"], latency)
+    
+    def get_stats(self):
+        """
+        Get counters per endpoint (calls, successes, failures, retries,
+        timeouts, short-circuited calls, average and maximum latency in
+        seconds) and the circuit breaker state.
+        """
+        with self._stats_lock:
+            endpoints = {}
+            for endpoint, stats in self._stats.items():
+                endpoints[endpoint] = dict(stats)
+                endpoints[endpoint]["average_latency"] = stats["total_latency"] / stats["calls"] if stats["calls"] else 0.0
+        return {"circuit": self.breaker.state, "endpoints": endpoints}
@@ -1,8 +1,17 @@
 import os
+import re
 import json
+import hashlib
 import logging
+import threading
 from openai import OpenAI
 
+from utils.database import DEFAULT_USER_ID, get_cached_category, save_cached_category, get_llm_result, save_llm_result
+from utils.classifier import predict_category
+from utils.data_utils import EXPENSE_CATEGORIES
+from utils.prompt_utils import PROMPT_TOKEN_BUDGET, build_spending_summary
+from utils.llm_client import LLM_DEADLINE, ResilientCaller
+
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -18,28 +27,49 @@ if not OPENAI_API_KEY:
     client = None
 else:
     try:
-        client = OpenAI(api_key=OPENAI_API_KEY)
+        # Retries are handled by llm_caller, with backoff and the circuit breaker
+        client = OpenAI(api_key=OPENAI_API_KEY, max_retries=0)
         logger.info("Successfully initialized OpenAI client")
     except Exception as e:
         logger.error(f"Failed to initialize OpenAI client: {e}")
         client = None
 
-def categorize_expense(description, amount):
+# Deadlines, retries and circuit breaking shared by every AI call in the process
+llm_caller = ResilientCaller()
+
+# Time budget of calls a user waits on interactively, in seconds
+INTERACTIVE_DEADLINE = 10
+
+def _chat_completion(endpoint, deadline=LLM_DEADLINE, **request):
     """
-    Use OpenAI to categorize an expense based on its description.
+    Create a chat completion through llm_caller. Raises CircuitOpenError
+    straight away while the API is failing, so callers use their fallbacks.
     """
-    # Check if client is initialized
-    if client is None:
-        logger.warning("OpenAI client not available. Using default category.")
-        return "Other"
-    
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": """You are a financial assistant that categorizes expenses.
-                Categorize the following expense into one of these categories:
-                - Housing (rent, mortgage, utilities)
+    return llm_caller.call(
+        endpoint,
+        lambda timeout: client.chat.completions.create(timeout=timeout, **request),
+        deadline
+    )
+
+def _stream_chat_completion(endpoint, deadline=LLM_DEADLINE, **request):
+    """
+    Stream a chat completion's chunks through llm_caller. A stream that
+    breaks off partway counts as a failed call, like an error response.
+    """
+    return llm_caller.stream(
+        endpoint,
+        lambda timeout: client.chat.completions.create(timeout=timeout, stream=True, **request),
+        deadline
+    )
+
+def get_llm_stats():
+    """Get per-endpoint AI call counters and latencies and the circuit breaker state."""
+    return llm_caller.get_stats()
+
+# Maximum number of expense descriptions sent in one batch categorization request
+CATEGORIZE_BATCH_SIZE = 50
+
+CATEGORY_DESCRIPTIONS = """- Housing (rent, mortgage, utilities)
                 - Transportation (car payments, gas, public transit)
                 - Food (groceries, restaurants)
                 - Entertainment (movies, games, streaming)
@@ -48,164 +78,465 @@ def categorize_expense(description, amount):
                 - Education (tuition, books)
                 - Travel (flights, hotels)
                 - Savings/Investment
-                - Other
+                - Other"""
+
+CATEGORIZATION_PROMPT = f"""You are a financial assistant that categorizes expenses.
+                Categorize the following expense into one of these categories:
+                {CATEGORY_DESCRIPTIONS}
+                
+                Respond with ONLY the category name, nothing else."""
+
+BATCH_CATEGORIZATION_PROMPT = f"""You are a financial assistant that categorizes expenses.
+                Categorize each of the following numbered expenses into one of these categories:
+                {CATEGORY_DESCRIPTIONS}
                 
-                Respond with ONLY the category name, nothing else."""},
+                Format your response as a JSON object with a 'categories' key mapping each expense number (as a string) to its category name."""
+
+# Hit/miss counters for the categorization cache in this process
+_categorization_stats = {"hits": 0, "misses": 0, "local": 0}
+_categorization_stats_lock = threading.Lock()
+
+def normalize_description(description):
+    """
+    Normalize an expense description into a categorization cache key:
+    lowercase words with digits and punctuation removed, so "Coffee Shop #12"
+    and "coffee shop" share an entry.
+    """
+    return " ".join(re.sub(r"[^a-z]+", " ", (description or "").lower()).split())[:255]
+
+def _count_categorization(outcome):
+    with _categorization_stats_lock:
+        _categorization_stats[outcome] += 1
+
+def get_categorization_stats():
+    """Get the categorization cache hit and miss counts, and local model answers, for this process."""
+    with _categorization_stats_lock:
+        return dict(_categorization_stats)
+
+def _category_totals(expenses):
+    """
+    Total expenses by category, summing integer cents so the totals are exact.
+    """
+    cents_by_category = {}
+    for expense in expenses:
+        category = expense['category']
+        cents_by_category[category] = cents_by_category.get(category, 0) + expense['amount_cents']
+    return {category: cents / 100 for category, cents in cents_by_category.items()}
+
+def categorize_expense(description, amount, user_id=DEFAULT_USER_ID):
+    """
+    Use OpenAI to categorize an expense based on its description.
+    Descriptions seen before are answered from the categorization cache, and
+    ones the user's local model is confident about skip the API call.
+    """
+    description_key = normalize_description(description)
+    if description_key:
+        cached_category = get_cached_category(description_key)
+        if cached_category is not None:
+            _count_categorization("hits")
+            return cached_category
+        _count_categorization("misses")
+    
+    local_category = predict_category(description, user_id)
+    if local_category is not None:
+        _count_categorization("local")
+        return local_category
+    
+    # Check if client is initialized
+    if client is None:
+        logger.warning("OpenAI client not available. Using default category.")
+        return "Other"
+    
+    try:
+        response = _chat_completion(
+            "categorize",
+            deadline=INTERACTIVE_DEADLINE,
+            model="gpt-4o",
+            messages=[
+                {"role": "system", "content": CATEGORIZATION_PROMPT},
                 {"role": "user", "content": f"Description: {description}, Amount: ${amount}"}
             ],
             max_tokens=20
         )
-        return response.choices[0].message.content.strip()
+        category = response.choices[0].message.content.strip()
+        # Only cache answers that are real categories
+        if description_key and category in EXPENSE_CATEGORIES:
+            save_cached_category(description_key, category)
+        return category
     except Exception as e:
         logger.error(f"Error categorizing expense: {e}")
         
         # Use simple keyword matching as fallback
-        description_lower = description.lower()
-        if any(word in description_lower for word in ["rent", "mortgage", "electric", "water", "gas bill", "internet"]):
-            return "Housing"
-        elif any(word in description_lower for word in ["car", "gas", "uber", "lyft", "taxi", "bus", "train", "subway"]):
-            return "Transportation"
-        elif any(word in description_lower for word in ["grocery", "restaurant", "food", "dinner", "lunch", "breakfast"]):
-            return "Food"
-        elif any(word in description_lower for word in ["movie", "game", "netflix", "spotify", "concert", "theater"]):
-            return "Entertainment"
-        elif any(word in description_lower for word in ["clothes", "shirt", "shoes", "dress", "electronics", "phone"]):
-            return "Shopping"
-        elif any(word in description_lower for word in ["doctor", "hospital", "medicine", "prescription", "therapy"]):
-            return "Health"
-        elif any(word in description_lower for word in ["tuition", "course", "book", "school", "college", "university"]):
-            return "Education"
-        elif any(word in description_lower for word in ["flight", "hotel", "vacation", "trip", "airbnb"]):
-            return "Travel"
-        elif any(word in description_lower for word in ["saving", "investment", "stock", "bond", "401k", "ira"]):
-            return "Savings/Investment"
+        return keyword_category(description)
+
+class KeywordClassifier:
+    """
+    Offline expense categorizer built from a keyword table.
+    
+    The table is a list of (category, keywords) pairs in precedence order.
+    All keywords are compiled into one lookahead regex and found in a single
+    left-to-right scan that reports the longest keyword starting at every
+    position, so overlapping keywords are all seen, as with a substring check
+    of each keyword. When several keywords occur, including shorter keywords
+    inside a longer match, the category listed first in the table wins.
+    """
+    
+    def __init__(self, keyword_table, default_category="Other"):
+        self.default_category = default_category
+        self.categories = [category for category, _ in keyword_table]
+        ranks = {}
+        for rank, (_, keywords) in enumerate(keyword_table):
+            for keyword in keywords:
+                ranks.setdefault(keyword.lower(), rank)
+        # Rank of each keyword as a match: the best rank of any keyword it contains,
+        # so "gas bill" still counts as Housing even though it also contains "gas"
+        self.match_ranks = {
+            keyword: min(rank for other, rank in ranks.items() if other in keyword)
+            for keyword in ranks
+        }
+        # Longest keywords first, since the regex takes the first alternative that matches;
+        # the lookahead consumes nothing, so a keyword starting inside another is still found
+        alternation = "|".join(re.escape(keyword) for keyword in sorted(ranks, key=len, reverse=True))
+        self.pattern = re.compile(f"(?=({alternation}))") if alternation else None
+    
+    def classify(self, description):
+        """Get the category for one description."""
+        if self.pattern is None or not description:
+            return self.default_category
+        matches = self.pattern.findall(description.lower())
+        if not matches:
+            return self.default_category
+        match_ranks = self.match_ranks
+        return self.categories[min(match_ranks[match] for match in matches)]
+    
+    def classify_many(self, descriptions):
+        """Get the categories for a list of descriptions."""
+        classify = self.classify
+        return [classify(description) for description in descriptions]
+
+# Keyword rules for offline categorization, in precedence order
+KEYWORD_CATEGORIES = [
+    ("Housing", ["rent", "mortgage", "electric", "water", "gas bill", "internet"]),
+    ("Transportation", ["car", "gas", "uber", "lyft", "taxi", "bus", "train", "subway"]),
+    ("Food", ["grocery", "restaurant", "food", "dinner", "lunch", "breakfast"]),
+    ("Entertainment", ["movie", "game", "netflix", "spotify", "concert", "theater"]),
+    ("Shopping", ["clothes", "shirt", "shoes", "dress", "electronics", "phone"]),
+    ("Health", ["doctor", "hospital", "medicine", "prescription", "therapy"]),
+    ("Education", ["tuition", "course", "book", "school", "college", "university"]),
+    ("Travel", ["flight", "hotel", "vacation", "trip", "airbnb"]),
+    ("Savings/Investment", ["saving", "investment", "stock", "bond", "401k", "ira"]),
+]
+
+keyword_classifier = KeywordClassifier(KEYWORD_CATEGORIES)
+
+def keyword_category(description):
+    """
+    Categorize an expense with simple keyword rules, used when the AI is unavailable.
+    """
+    return keyword_classifier.classify(description)
+
+def _request_batch_categories(batch):
+    """
+    Categorize (description, amount) pairs in one JSON-mode request.
+    Returns a list with a category, or None where the answer is missing or invalid, for each pair.
+    """
+    expense_lines = "\n".join(
+        f"{index}: Description: {description}, Amount: ${amount}" for index, (description, amount) in enumerate(batch)
+    )
+    response = _chat_completion(
+        "categorize_batch",
+        model="gpt-4o",
+        messages=[
+            {"role": "system", "content": BATCH_CATEGORIZATION_PROMPT},
+            {"role": "user", "content": expense_lines}
+        ],
+        response_format={"type": "json_object"}
+    )
+    categories = json.loads(response.choices[0].message.content).get("categories", {})
+    if isinstance(categories, list):
+        categories = {str(index): category for index, category in enumerate(categories)}
+    
+    results = []
+    for index in range(len(batch)):
+        category = categories.get(str(index))
+        category = category.strip() if isinstance(category, str) else None
+        results.append(category if category in EXPENSE_CATEGORIES else None)
+    return results
+
+def categorize_expenses_batch(items, batch_size=CATEGORIZE_BATCH_SIZE, user_id=DEFAULT_USER_ID):
+    """
+    Categorize many expenses with one model call per batch_size descriptions.
+    
+    items is a list of dicts with "description" and "amount"; the categories
+    are returned in the same order. Cached descriptions and ones the user's
+    local model is confident about are answered without a call, and
+    repeated descriptions are only sent once. Items the model does
+    not answer with a valid category fall back to the keyword rules.
+    """
+    categories = [None] * len(items)
+    # Uncached descriptions by cache key, with the positions of every item sharing each
+    pending = {}
+    for position, item in enumerate(items):
+        description_key = normalize_description(item["description"])
+        if not description_key:
+            categories[position] = keyword_category(item["description"])
+        elif description_key in pending:
+            pending[description_key][1].append(position)
         else:
-            return "Other"
+            cached_category = get_cached_category(description_key)
+            if cached_category is not None:
+                _count_categorization("hits")
+                categories[position] = cached_category
+            else:
+                _count_categorization("misses")
+                local_category = predict_category(item["description"], user_id)
+                if local_category is not None:
+                    _count_categorization("local")
+                    categories[position] = local_category
+                    continue
+                pending[description_key] = ((item["description"], item["amount"]), [position])
+    
+    if client is None and pending:
+        logger.warning("OpenAI client not available. Using keyword categorization.")
+    
+    pending_items = list(pending.items())
+    for start in range(0, len(pending_items), batch_size):
+        batch = pending_items[start:start + batch_size]
+        answers = [None] * len(batch)
+        if client is not None:
+            try:
+                answers = _request_batch_categories([expense for _, (expense, _) in batch])
+            except Exception as e:
+                logger.error(f"Error categorizing expense batch: {e}")
+        
+        for (description_key, ((description, _), positions)), category in zip(batch, answers):
+            if category is not None:
+                save_cached_category(description_key, category)
+            else:
+                category = keyword_category(description)
+            for position in positions:
+                categories[position] = category
+    
+    return categories
+
+def _input_fingerprint(model, messages):
+    """Stable hash of a chat request, so results can be reused while its input is unchanged."""
+    payload = json.dumps({"model": model, "messages": messages}, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def _basic_insights(expenses):
+    """Rule-based insights used when the AI is not available."""
+    category_totals = _category_totals(expenses)
+    
+    # Sort categories by amount (highest first)
+    sorted_categories = sorted(category_totals.items(), key=lambda x: x[1], reverse=True)
+    
+    insights = []
+    if sorted_categories:
+        insights.append(f"Your highest spending category is {sorted_categories[0][0]} at ${sorted_categories[0][1]:.2f}.")
+    
+    if len(sorted_categories) >= 2:
+        insights.append(f"Consider reducing spending in your top categories: {sorted_categories[0][0]} and {sorted_categories[1][0]}.")
+        
+    insights.append("Track expenses consistently to get more detailed AI-powered insights.")
+    return insights
+
+# Insights are streamed one JSON object per line, so each can be shown as soon as it is complete
+INSIGHTS_PROMPT = """You are a financial advisor analyzing spending patterns.
+                You are given a summary of the user's expense history rather than every expense.
+                Provide 3-5 concise, actionable insights about spending patterns.
+                Write each insight on its own line as a JSON object of the form {"insight": "..."}, with no other text.
+                Be specific, practical, and focus on areas where the user could save money."""
+
+# Matches list markers a model may put in front of plain-text lines
+LIST_MARKER_PATTERN = re.compile(r"^(?:[-*\u2022]|\d+[.)])\s+")
+
+def _parse_insight_line(line):
+    """Get the insight from one line of streamed output, or None for blank and formatting lines."""
+    line = line.strip()
+    if not line or line.startswith("```"):
+        return None
+    try:
+        value = json.loads(line)
+    except ValueError:
+        # Tolerate plain-text lines instead of dropping them
+        return LIST_MARKER_PATTERN.sub("", line) or None
+    if isinstance(value, dict):
+        value = value.get("insight")
+    return value.strip() if isinstance(value, str) and value.strip() else None
+
+def _iter_streamed_lines(stream):
+    """Yield complete lines of text from a streaming chat completion as they arrive."""
+    buffer = ""
+    for chunk in stream:
+        if not chunk.choices:
+            continue
+        buffer += chunk.choices[0].delta.content or ""
+        *lines, buffer = buffer.split("\n")
+        yield from lines
+    yield buffer
 
-def analyze_spending_patterns(expenses):
+class InsightStreamError(Exception):
     """
-    Analyze spending patterns and provide insights.
+    Raised by stream_spending_insights when the response breaks off after
+    some insights were already yielded. Those insights are in .insights and
+    were not stored, since the list is incomplete.
+    """
+    
+    def __init__(self, insights):
+        super().__init__(f"Insight stream broke off after {len(insights)} insights")
+        self.insights = insights
+
+def stream_spending_insights(expenses, user_id=DEFAULT_USER_ID, force=False, token_budget=PROMPT_TOKEN_BUDGET):
+    """
+    Yield spending insights one at a time, as soon as the model finishes each.
+    
+    The model is sent a statistical summary of the history bounded by
+    token_budget rather than every expense, and streams one JSON line per
+    insight. Insights are stored with a fingerprint of the request and
+    replayed directly while the expenses are unchanged; pass force=True to
+    regenerate. The rule-based insights are yielded if the call fails before
+    any insight arrives; if it fails after some were yielded,
+    InsightStreamError is raised instead.
     """
     if not expenses or len(expenses) < 3:
-        return ["Not enough expense data to analyze patterns. Add more expenses to get insights."]
+        yield "Not enough expense data to analyze patterns. Add more expenses to get insights."
+        return
     
     # Check if client is initialized
     if client is None:
         logger.warning("OpenAI client not available. Using basic insights.")
-        # Return basic insights
-        category_totals = {}
-        for expense in expenses:
-            category = expense['category']
-            amount = float(expense['amount'])
-            if category in category_totals:
-                category_totals[category] += amount
-            else:
-                category_totals[category] = amount
-        
-        # Sort categories by amount (highest first)
-        sorted_categories = sorted(category_totals.items(), key=lambda x: x[1], reverse=True)
-        
-        insights = []
-        if sorted_categories:
-            insights.append(f"Your highest spending category is {sorted_categories[0][0]} at ${sorted_categories[0][1]:.2f}.")
+        yield from _basic_insights(expenses)
+        return
         
-        if len(sorted_categories) >= 2:
-            insights.append(f"Consider reducing spending in your top categories: {sorted_categories[0][0]} and {sorted_categories[1][0]}.")
-            
-        insights.append("Track expenses consistently to get more detailed AI-powered insights.")
-        return insights
-        
-    expenses_text = "\n".join([f"Category: {e['category']}, Amount: ${e['amount']}, Date: {e['date']}, Description: {e['description']}" for e in expenses])
+    expenses_summary = build_spending_summary(expenses, token_budget)
+    
+    messages = [
+        {"role": "system", "content": INSIGHTS_PROMPT},
+        {"role": "user", "content": f"Here is a summary of the expense history:\n{expenses_summary}"}
+    ]
+    fingerprint = _input_fingerprint("gpt-4o", messages)
+    
+    if not force:
+        cached_insights = get_llm_result("spending_insights", fingerprint, user_id)
+        if cached_insights is not None:
+            yield from cached_insights
+            return
     
+    insights = []
     try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": """You are a financial advisor analyzing spending patterns.
-                Provide 3-5 concise, actionable insights about spending patterns.
-                Format your response as a JSON object with an 'insights' key containing an array of strings, each string being one insight.
-                Be specific, practical, and focus on areas where the user could save money."""},
-                {"role": "user", "content": f"Here are the recent expenses:\n{expenses_text}"}
-            ],
-            response_format={"type": "json_object"}
-        )
-        insights_data = json.loads(response.choices[0].message.content)
-        return insights_data.get("insights", ["Track expenses consistently to get more detailed AI-powered insights."])
+        stream = _stream_chat_completion("spending_insights", model="gpt-4o", messages=messages)
+        for line in _iter_streamed_lines(stream):
+            insight = _parse_insight_line(line)
+            if insight is not None:
+                insights.append(insight)
+                yield insight
     except Exception as e:
         logger.error(f"Error analyzing spending patterns: {e}")
-        return ["Unable to analyze spending patterns at this time. Please try again later."]
+        if not insights:
+            yield from _basic_insights(expenses)
+            return
+        # The caller has shown some insights already; a partial answer must not be stored as complete
+        raise InsightStreamError(insights) from e
+    
+    if not insights:
+        insights = ["Track expenses consistently to get more detailed AI-powered insights."]
+        yield insights[0]
+    save_llm_result("spending_insights", fingerprint, insights, user_id)
 
-def get_saving_recommendations(expenses, budgets):
+def analyze_spending_patterns(expenses, user_id=DEFAULT_USER_ID, force=False, token_budget=PROMPT_TOKEN_BUDGET):
+    """
+    Analyze spending patterns and provide insights.
+    
+    Returns the full list from stream_spending_insights, including its
+    stored-result reuse and fallbacks. If the response breaks off partway,
+    the rule-based insights are returned rather than an incomplete list.
+    """
+    try:
+        return list(stream_spending_insights(expenses, user_id, force, token_budget))
+    except InsightStreamError:
+        return _basic_insights(expenses)
+
+def _basic_saving_recommendations(expenses_by_category, budgets):
+    """Rule-based saving recommendations used when the AI is not available."""
+    recommendations = []
+    
+    # Check for over-budget categories
+    for category, amount in expenses_by_category.items():
+        budget_amount = float(budgets.get(category, 0))
+        if budget_amount > 0 and amount > budget_amount:
+            recommendations.append(f"You're over budget in {category}. Try to reduce spending in this category.")
+    
+    # Add general recommendations
+    if "Food" in expenses_by_category:
+        recommendations.append("Consider meal planning to reduce food expenses and minimize waste.")
+        
+    if "Entertainment" in expenses_by_category:
+        recommendations.append("Look for free or low-cost entertainment options in your area.")
+        
+    if "Shopping" in expenses_by_category:
+        recommendations.append("Consider implementing a 24-hour rule before making non-essential purchases.")
+        
+    if not recommendations:
+        recommendations.append("Track more expenses to get personalized saving recommendations.")
+        
+    return recommendations[:5]  # Return up to 5 recommendations
+
+def get_saving_recommendations(expenses, budgets, user_id=DEFAULT_USER_ID, force=False):
     """
     Generate personalized saving recommendations based on spending history and budgets.
+    
+    Like analyze_spending_patterns, results are reused while the spending
+    totals and budgets are unchanged unless force=True.
     """
     if not expenses:
         return ["Start tracking your expenses to get personalized recommendations."]
     
     # Prepare the expense and budget data for the AI
-    expenses_by_category = {}
-    for expense in expenses:
-        category = expense['category']
-        amount = float(expense['amount'])
-        if category in expenses_by_category:
-            expenses_by_category[category] += amount
-        else:
-            expenses_by_category[category] = amount
+    expenses_by_category = _category_totals(expenses)
     
     # Check if client is initialized
     if client is None:
         logger.warning("OpenAI client not available. Using basic recommendations.")
-        
-        # Generate basic recommendations
-        recommendations = []
-        
-        # Check for over-budget categories
-        for category, amount in expenses_by_category.items():
-            budget_amount = float(budgets.get(category, 0))
-            if budget_amount > 0 and amount > budget_amount:
-                recommendations.append(f"You're over budget in {category}. Try to reduce spending in this category.")
-        
-        # Add general recommendations
-        if "Food" in expenses_by_category:
-            recommendations.append("Consider meal planning to reduce food expenses and minimize waste.")
-            
-        if "Entertainment" in expenses_by_category:
-            recommendations.append("Look for free or low-cost entertainment options in your area.")
-            
-        if "Shopping" in expenses_by_category:
-            recommendations.append("Consider implementing a 24-hour rule before making non-essential purchases.")
-            
-        if not recommendations:
-            recommendations.append("Track more expenses to get personalized saving recommendations.")
-            
-        return recommendations[:5]  # Return up to 5 recommendations
+        return _basic_saving_recommendations(expenses_by_category, budgets)
     
     expense_summary = "\n".join([f"- {category}: ${amount:.2f}" for category, amount in expenses_by_category.items()])
     budget_summary = "\n".join([f"- {category}: ${amount}" for category, amount in budgets.items()])
     
-    try:
-        response = client.chat.completions.create(
-            model="gpt-4o",
-            messages=[
-                {"role": "system", "content": """You are a financial advisor providing savings recommendations.
+    messages = [
+        {"role": "system", "content": """You are a financial advisor providing savings recommendations.
                 Based on the user's spending history and budget, provide 3-5 practical, specific tips to help them save money.
                 Format your response as a JSON object with a 'recommendations' key containing an array of strings, each string being one recommendation.
                 Focus on actionable advice that can be implemented right away."""},
-                {"role": "user", "content": f"""
+        {"role": "user", "content": f"""
                 Total spending by category:
                 {expense_summary}
                 
                 Budget by category:
                 {budget_summary}
                 """}
-            ],
+    ]
+    fingerprint = _input_fingerprint("gpt-4o", messages)
+    
+    if not force:
+        cached_recommendations = get_llm_result("saving_recommendations", fingerprint, user_id)
+        if cached_recommendations is not None:
+            return cached_recommendations
+    
+    try:
+        response = _chat_completion(
+            "saving_recommendations",
+            model="gpt-4o",
+            messages=messages,
             response_format={"type": "json_object"}
         )
         recommendations_data = json.loads(response.choices[0].message.content)
-        return recommendations_data.get("recommendations", ["Track more expenses to get personalized saving recommendations."])
+        recommendations = recommendations_data.get("recommendations", ["Track more expenses to get personalized saving recommendations."])
+        save_llm_result("saving_recommendations", fingerprint, recommendations, user_id)
+        return recommendations
     except Exception as e:
         logger.error(f"Error getting saving recommendations: {e}")
-        return ["Unable to generate saving recommendations at this time. Please try again later."]
+        return _basic_saving_recommendations(expenses_by_category, budgets)
 
 def get_budget_recommendations(expenses):
     """
@@ -215,14 +546,7 @@ def get_budget_recommendations(expenses):
         return {}
     
     # Calculate total expenses by category
-    expenses_by_category = {}
-    for expense in expenses:
-        category = expense['category']
-        amount = float(expense['amount'])
-        if category in expenses_by_category:
-            expenses_by_category[category] += amount
-        else:
-            expenses_by_category[category] = amount
+    expenses_by_category = _category_totals(expenses)
             
     # Check if client is initialized
     if client is None:
@@ -270,7 +594,8 @@ def get_budget_recommendations(expenses):
     expense_summary = "\n".join([f"- {category}: ${amount:.2f}" for category, amount in expenses_by_category.items()])
     
     try:
-        response = client.chat.completions.create(
+        response = _chat_completion(
+            "budget_recommendations",
             model="gpt-4o",
             messages=[
                 {"role": "system", "content": """You are a financial advisor providing budget recommendations.
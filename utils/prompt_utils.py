@@ -0,0 +1,176 @@
+"""Compact, token-bounded summaries of expense history for AI prompts."""
+
+import os
+import re
+
+import numpy as np
+import pandas as pd
+
+from utils.data_utils import get_expense_store
+
+# Approximate token budget for the expense summary sent with insight requests
+PROMPT_TOKEN_BUDGET = int(os.environ.get("FINANCE_PROMPT_TOKEN_BUDGET", "1500"))
+# Most recent months shown in the per-category monthly table
+SUMMARY_MONTHS = 6
+# Rows listed in the merchant, recurring-charge and outlier sections
+SUMMARY_TOP_N = 8
+# Longest description text quoted in the summary
+SUMMARY_DESCRIPTION_LENGTH = 40
+
+def estimate_tokens(text):
+    """
+    Estimate the number of tokens in a text.
+    
+    Uses the usual rule of thumb of about four characters per token, which is
+    close enough for budgeting English text and numbers without a tokenizer.
+    """
+    return (len(text) + 3) // 4
+
+def merchant_key(description):
+    """
+    Group descriptions by merchant: lowercased, without digits, store numbers
+    or punctuation, and cut to the first three words.
+    """
+    return " ".join(re.sub(r"[^a-z]+", " ", (description or "").lower()).split()[:3])
+
+def _dollars(cents):
+    return f"${cents / 100:,.2f}"
+
+def _truncate(text):
+    text = " ".join(str(text).split())
+    if len(text) > SUMMARY_DESCRIPTION_LENGTH:
+        return text[:SUMMARY_DESCRIPTION_LENGTH - 3] + "..."
+    return text
+
+def _overview_section(store, frame):
+    first_date, last_date = np.datetime_as_string(store.dates[[0, -1]], unit="D")
+    month_count = frame["month"].nunique()
+    total = int(store.amount_cents.sum())
+    return "Overview", [
+        f"{len(store)} expenses from {first_date} to {last_date} ({month_count} months), total {_dollars(total)}",
+        f"Average per month {_dollars(total / month_count)}, median expense {_dollars(float(np.median(store.amount_cents)))}"
+    ]
+
+def _monthly_section(frame):
+    months = sorted(frame["month"].unique())[-SUMMARY_MONTHS:]
+    recent = frame[frame["month"].isin(months)]
+    table = recent.pivot_table(
+        index="category", columns="month", values="cents", aggfunc="sum", fill_value=0, observed=True
+    ).reindex(columns=months, fill_value=0)
+    table = table.loc[table.sum(axis=1).sort_values(ascending=False).index]
+    lines = [f"Columns: {', '.join(months)} (whole dollars; the last month may be partial)"]
+    for category, row in table.iterrows():
+        lines.append(f"{category}: " + ", ".join(str(int(round(cents / 100))) for cents in row))
+    return "Spending by category per month", lines
+
+def _trend_section(frame):
+    months = sorted(frame["month"].unique())
+    if len(months) < 2:
+        return "Trends", []
+    latest, previous = months[-1], months[-SUMMARY_MONTHS - 1:-1]
+    monthly = frame.groupby(["category", "month"], observed=True)["cents"].sum().unstack(fill_value=0)
+    monthly = monthly.reindex(columns=months, fill_value=0)
+    baseline = monthly[previous].mean(axis=1)
+    change = (monthly[latest] - baseline) / baseline.where(baseline > 0)
+    lines = []
+    for category in change.abs().sort_values(ascending=False).dropna().index[:SUMMARY_TOP_N]:
+        lines.append(
+            f"{category}: {_dollars(monthly.at[category, latest])} in {latest} vs "
+            f"{_dollars(baseline[category])} average over the previous {len(previous)} months ({change[category]:+.0%})"
+        )
+    return "Trends", lines
+
+def _merchant_section(frame):
+    merchants = frame[frame["merchant"] != ""].groupby("merchant")["cents"].agg(["sum", "count"])
+    lines = []
+    for merchant, row in merchants.sort_values("sum", ascending=False).head(SUMMARY_TOP_N).iterrows():
+        lines.append(f"{_truncate(merchant)}: {_dollars(row['sum'])} over {row['count']} expenses")
+    return "Top merchants", lines
+
+def _recurring_section(frame):
+    grouped = frame[frame["merchant"] != ""].groupby("merchant")
+    stats = grouped.agg(
+        months=("month", "nunique"),
+        count=("cents", "size"),
+        median=("cents", "median"),
+        spread=("cents", lambda cents: (cents.max() - cents.min()) / max(cents.median(), 1)),
+        category=("category", "first")
+    )
+    # Charges seen about once a month, in at least three months, for a near-constant amount
+    recurring = stats[(stats["months"] >= 3) & (stats["count"] <= stats["months"] * 1.5) & (stats["spread"] <= 0.2)]
+    lines = []
+    for merchant, row in recurring.sort_values("median", ascending=False).head(SUMMARY_TOP_N).iterrows():
+        lines.append(f"{_truncate(merchant)} ({row['category']}): about {_dollars(row['median'])} in {row['months']} months")
+    return "Recurring charges", lines
+
+def _outlier_section(frame):
+    def typical(key):
+        median = frame.groupby(key, observed=True)["cents"].transform("median")
+        deviation = (frame["cents"] - median).abs().groupby(frame[key], observed=True).transform("median")
+        return median, deviation
+    
+    # Compare against the merchant's own history when there is enough of it, else the category's
+    merchant_median, merchant_deviation = typical("merchant")
+    category_median, category_deviation = typical("category")
+    use_merchant = frame.groupby("merchant")["cents"].transform("size") >= 5
+    median = merchant_median.where(use_merchant, category_median)
+    deviation = merchant_deviation.where(use_merchant, category_deviation)
+    # Robust z-score against the typical amount, ignoring small absolute differences
+    score = (frame["cents"] - median) / (1.4826 * deviation.clip(lower=100))
+    outliers = frame[(score > 3.5) & (frame["cents"] > 2 * median)]
+    lines = []
+    for index, row in outliers.sort_values("cents", ascending=False).head(SUMMARY_TOP_N).iterrows():
+        lines.append(
+            f"{row['date']} {_truncate(row['description'])} ({row['category']}): "
+            f"{_dollars(row['cents'])}, {row['cents'] / median[index]:.1f}x the typical amount"
+        )
+    return "Unusually large expenses", lines
+
+def build_spending_summary(expenses, token_budget=PROMPT_TOKEN_BUDGET):
+    """
+    Summarize an expense history as prompt text of at most about token_budget tokens.
+    
+    Instead of one line per expense, the summary lists per-category monthly
+    totals, trends, top merchants, recurring charges and outliers, so its size
+    does not grow with the history. Sections are added in that order of
+    importance and lines that would exceed the budget are left out.
+    """
+    store = get_expense_store(expenses)
+    if not len(store):
+        return ""
+    
+    frame = pd.DataFrame({
+        "date": np.datetime_as_string(store.dates, unit="D"),
+        "month": np.datetime_as_string(store.dates.astype("datetime64[M]"), unit="M"),
+        "cents": store.amount_cents,
+        "category": pd.Categorical.from_codes(store.category_codes, store.categories),
+        "description": store.descriptions
+    })
+    frame["merchant"] = [merchant_key(description) for description in store.descriptions]
+    
+    sections = [
+        _overview_section(store, frame),
+        _monthly_section(frame),
+        _trend_section(frame),
+        _merchant_section(frame),
+        _recurring_section(frame),
+        _outlier_section(frame)
+    ]
+    
+    lines = []
+    used = 0
+    for title, section_lines in sections:
+        header = f"{title}:"
+        # Skip a section unless its header and at least one line fit
+        if not section_lines or used + estimate_tokens(header) + estimate_tokens(section_lines[0]) + 2 > token_budget:
+            continue
+        lines.append(header)
+        used += estimate_tokens(header) + 1
+        for line in section_lines:
+            line = f"- {line}"
+            cost = estimate_tokens(line) + 1
+            if used + cost > token_budget:
+                break
+            lines.append(line)
+            used += cost
+    return "\n".join(lines)
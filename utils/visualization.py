@@ -3,13 +3,14 @@ import plotly.graph_objects as go
 import pandas as pd
 from datetime import datetime, timedelta
 import calendar
-from utils.data_utils import get_expense_dataframe, get_expenses_by_category, get_expenses_by_date, calculate_budget_progress, get_this_month_expenses
+from utils.database import DEFAULT_USER_ID
+from utils.data_utils import get_expenses_by_category, get_period_totals, calculate_budget_progress, get_this_month_expenses, get_monthly_breakdown
 
-def create_spending_by_category_chart(expenses):
+def create_spending_by_category_chart(expenses=None, filters=None, user_id=DEFAULT_USER_ID):
     """
     Create a pie chart showing spending by category.
     """
-    category_totals = get_expenses_by_category(expenses)
+    category_totals = get_expenses_by_category(expenses, filters, user_id)
     
     if not category_totals:
         return go.Figure().update_layout(
@@ -41,23 +42,23 @@ def create_spending_by_category_chart(expenses):
     
     return fig
 
-def create_spending_over_time_chart(expenses, period="month"):
+def create_spending_over_time_chart(expenses=None, period="month", user_id=DEFAULT_USER_ID):
     """
     Create a line chart showing spending over time.
     """
-    time_totals = get_expenses_by_date(expenses, period)
+    period_starts, totals = get_period_totals(expenses, period, user_id=user_id)
     
-    if not time_totals:
+    if len(period_starts) == 0:
         return go.Figure().update_layout(
             title="No expense data available",
             annotations=[dict(text="Add expenses to see spending over time", showarrow=False, xref="paper", yref="paper", x=0.5, y=0.5)]
         )
     
-    # Convert to dataframe
+    # Period starts are already sorted
     df = pd.DataFrame({
-        "Date": pd.to_datetime(list(time_totals.keys())),
-        "Amount": list(time_totals.values())
-    }).sort_values("Date")
+        "Date": period_starts.astype("datetime64[ns]"),
+        "Amount": totals
+    })
     
     # Create line chart
     fig = px.line(
@@ -77,11 +78,11 @@ def create_spending_over_time_chart(expenses, period="month"):
     
     return fig
 
-def create_budget_progress_chart(expenses, budgets):
+def create_budget_progress_chart(expenses=None, budgets=None, user_id=DEFAULT_USER_ID):
     """
     Create a progress bar chart showing budget utilization.
     """
-    progress = calculate_budget_progress(expenses, budgets)
+    progress = calculate_budget_progress(expenses, budgets, user_id)
     
     if not progress:
         return go.Figure().update_layout(
@@ -133,23 +134,23 @@ def create_budget_progress_chart(expenses, budgets):
     
     return fig
 
-def create_monthly_comparison_chart(expenses):
+def create_monthly_comparison_chart(expenses=None, user_id=DEFAULT_USER_ID):
     """
     Create a bar chart comparing spending across months.
     """
-    df = get_expense_dataframe(expenses)
+    monthly_breakdown = get_monthly_breakdown(expenses, user_id=user_id)
     
-    if df.empty:
+    if not monthly_breakdown:
         return go.Figure().update_layout(
             title="No expense data available",
             annotations=[dict(text="Add expenses to see monthly comparison", showarrow=False, xref="paper", yref="paper", x=0.5, y=0.5)]
         )
     
-    # Add month column
-    df["month"] = df["date"].dt.strftime("%Y-%m")
-    
-    # Group by month
-    monthly_totals = df.groupby("month")["amount"].sum().reset_index()
+    # Total each month across categories
+    monthly_totals = pd.DataFrame({
+        "month": list(monthly_breakdown.keys()),
+        "amount": [sum(totals.values()) for totals in monthly_breakdown.values()]
+    })
     
     # Sort by month
     monthly_totals = monthly_totals.sort_values("month")
@@ -172,28 +173,22 @@ def create_monthly_comparison_chart(expenses):
     
     return fig
 
-def create_category_comparison_chart(expenses):
+def create_category_comparison_chart(expenses=None, filters=None, user_id=DEFAULT_USER_ID):
     """
     Create a stacked bar chart showing category spending across months.
     """
-    df = get_expense_dataframe(expenses)
+    monthly_breakdown = get_monthly_breakdown(expenses, filters, user_id)
     
-    if df.empty:
+    if not monthly_breakdown:
         return go.Figure().update_layout(
             title="No expense data available",
             annotations=[dict(text="Add expenses to see category comparison", showarrow=False, xref="paper", yref="paper", x=0.5, y=0.5)]
         )
     
-    # Add month column
-    df["month"] = df["date"].dt.strftime("%Y-%m")
-    
-    # Group by month and category
-    monthly_category = df.pivot_table(
-        index="month", 
-        columns="category", 
-        values="amount", 
-        aggfunc="sum"
-    ).fillna(0).reset_index()
+    # Build a month x category table from the pre-aggregated totals
+    monthly_category = pd.DataFrame.from_dict(monthly_breakdown, orient="index").fillna(0)
+    monthly_category.index.name = "month"
+    monthly_category = monthly_category.reset_index()
     
     # Sort by month
     monthly_category = monthly_category.sort_values("month")